@@ -12,3 +12,57 @@ REGISTERED_FACE_DIR = os.path.join(os.getcwd(), "data", "registered_faces")
 THRESHOLD = 0.5
 L2_THRESHOLD = 1.2 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+
+# 프레임 품질 사전 검사 (모델 호출 전 blur / 노출 / 얼굴 크기 확인)
+QUALITY_MIN_BLUR_VAR = float(os.getenv("QUALITY_MIN_BLUR_VAR", "30"))      # Laplacian 분산 최소값
+QUALITY_MIN_BRIGHTNESS = float(os.getenv("QUALITY_MIN_BRIGHTNESS", "40"))  # 평균 밝기 최소값 (0~255)
+QUALITY_MAX_BRIGHTNESS = float(os.getenv("QUALITY_MAX_BRIGHTNESS", "215")) # 평균 밝기 최대값 (0~255)
+QUALITY_MAX_CLIPPED_RATIO = float(os.getenv("QUALITY_MAX_CLIPPED_RATIO", "0.4"))  # 포화(>=250) 픽셀 비율 최대값
+QUALITY_MIN_FACE_RATIO = float(os.getenv("QUALITY_MIN_FACE_RATIO", "0.1"))  # 얼굴 폭 / 이미지 폭 최소값
+
+# 여러 uvicorn worker가 공유하는 embedding 캐시 (공유 메모리, 기본 비활성화)
+SHARED_EMBEDDING_CACHE = os.getenv("SHARED_EMBEDDING_CACHE", "0") == "1"
+EMBEDDING_SHM_NAME = os.getenv("EMBEDDING_SHM_NAME", "tickity_embeddings")
+EMBEDDING_SHM_SLOTS = int(os.getenv("EMBEDDING_SHM_SLOTS", "4096"))        # 슬롯 1개 ≈ 10KB (5 x 512 float32), 가득 차면 오래 조회 안 된 사용자부터 교체
+EMBEDDING_SHM_TEMPLATES = int(os.getenv("EMBEDDING_SHM_TEMPLATES", "5"))   # KMeans 대표 embedding 개수
+
+# AI 엔드포인트 동시 실행 제한 (verify > identify > register 순으로 우선 처리)
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", str(os.cpu_count() or 2)))
+ADMISSION_CLASSES = {
+    # priority: 작을수록 먼저 실행 / limit: 동시 실행 최대 개수 / max_wait: 대기 허용 시간(초)
+    "verify": {"priority": 0, "limit": AI_MAX_CONCURRENCY, "max_queue": 64, "max_wait": 2.0},
+    "identify": {"priority": 1, "limit": AI_MAX_CONCURRENCY, "max_queue": 32, "max_wait": 3.0},
+    "register": {"priority": 2, "limit": max(1, AI_MAX_CONCURRENCY // 2), "max_queue": 8, "max_wait": 30.0},
+}
+
+# 비동기 얼굴 등록 job (로컬 SQLite 큐, worker 재시작 후에도 유지)
+REGISTRATION_JOB_DIR = os.path.join(os.getcwd(), "data", "registration_jobs")
+REGISTRATION_WORKERS = int(os.getenv("REGISTRATION_WORKERS", "1"))              # 0이면 이 프로세스에서는 job 처리 안 함
+REGISTRATION_JOB_LEASE_SEC = int(os.getenv("REGISTRATION_JOB_LEASE_SEC", "300"))  # 갱신 없이 지나면 다른 worker가 재처리
+REGISTRATION_JOB_MAX_ATTEMPTS = int(os.getenv("REGISTRATION_JOB_MAX_ATTEMPTS", "3"))
+
+# 엔드포인트별 이미지 입력 정책 (JPEG 축소 디코딩 배율 + 검출기 입력 크기 자동 선택)
+# - expected_face_ratio: 이미지 짧은 변 대비 예상 얼굴 폭
+# - min_face_px: 축소 디코딩 후에도 유지할 얼굴 최소 폭 (ArcFace 입력 112px 기준)
+# - det_min_face_px: 검출기 입력에서 얼굴 최소 폭 / det_sizes: 선택 가능한 검출기 입력 크기
+INGESTION_POLICIES = {
+    "verify": {"expected_face_ratio": 0.35, "min_face_px": 112, "det_min_face_px": 48, "det_sizes": [160, 320, 480, 640]},
+    "identify": {"expected_face_ratio": 0.25, "min_face_px": 112, "det_min_face_px": 40, "det_sizes": [320, 480, 640]},
+    "register": {"expected_face_ratio": 0.3, "min_face_px": 112, "det_min_face_px": 48, "det_sizes": [320, 480, 640]},
+}
+
+# 1:N 식별 샤딩 (user_id 해시로 gallery를 여러 AI 서버에 분산)
+# - 샤드 노드: SHARD_INDEX / SHARD_COUNT 지정 → 자기 몫의 사용자 embedding만 적재
+# - 코디네이터: SHARD_URLS(쉼표 구분)로 샤드들에 검색을 동시에 요청하고 결과 병합
+SHARD_INDEX = int(os.getenv("SHARD_INDEX")) if os.getenv("SHARD_INDEX") else None
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_URLS = [url.strip().rstrip("/") for url in os.getenv("SHARD_URLS", "").split(",") if url.strip()]
+SHARD_TIMEOUT_SEC = float(os.getenv("SHARD_TIMEOUT_SEC", "1.0"))   # 이 시간 안에 응답한 샤드 결과만 병합
+SHARD_TOP_K = int(os.getenv("SHARD_TOP_K", "5"))
+SHARD_REFRESH_SEC = float(os.getenv("SHARD_REFRESH_SEC", "60"))   # 샤드 노드가 새 등록/재등록/삭제분을 반영하는 주기 (0: 시작 시에만 적재)
+
+# 얼굴 중복 등록 검사 (한 사람이 여러 계정에 얼굴을 등록하는 것 방지)
+# - off: 검사 안 함 / flag: 등록은 진행하고 결과에 표시 / block: 등록 거부
+DUPLICATE_CHECK_MODE = os.getenv("DUPLICATE_CHECK_MODE", "off")
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.6"))            # 이 값 이상이면 같은 사람으로 판단
+DUPLICATE_GALLERY_TTL_SEC = int(os.getenv("DUPLICATE_GALLERY_TTL_SEC", "600"))  # 다른 worker 등록분 반영 주기
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+얼굴 인증 임계값 오프라인 평가 / 보정 스크립트
+
+config.py의 THRESHOLD(코사인 유사도)를 라벨이 있는 embedding 데이터셋으로 평가합니다.
+  - 모든 probe × 모든 사용자 점수를 probe 묶음(chunk) 단위 행렬곱으로 계산 (메모리 상한 지정 가능)
+  - 점수는 고정 구간 히스토그램으로만 누적하므로 impostor 쌍이 수억 개여도 메모리가 늘지 않음
+  - 사용자당 template(KMeans 5개) 점수 결합 방식별로 FAR / FRR / ROC / EER / 권장 임계값 출력
+      max  : template 중 최대 유사도 (현재 /face/verify-frame 방식)
+      mean : template 유사도 평균
+      topk : 상위 k개 template 유사도 평균 (template이 k개 미만인 사용자는 가진 template 전체 평균)
+
+데이터셋 (.npz):
+    templates      (I, T, D)  사용자별 등록 template (T개 미만이면 0으로 채우고 template_counts 지정)
+    template_counts (I,)      (선택) 사용자별 실제 template 수
+    probes         (P, D)     평가용 얼굴 embedding
+    probe_labels   (P,)       각 probe의 정답 사용자 인덱스 (0..I-1)
+
+사용:
+    python evaluate_thresholds.py --dataset eval_set.npz --output report.json --roc-csv roc
+    python evaluate_thresholds.py --synthetic 20000 --max-memory-mb 512     # 합성 데이터로 성능 확인
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# ✅ 현재 파일 기준으로 루트 디렉토리를 sys.path에 등록
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from utils.similarity import normalize_rows
+
+NUM_BINS = 4000          # [-1, 1] 구간을 0.0005 단위로 나눔
+FAR_TARGETS = [1e-2, 1e-3, 1e-4, 1e-5]
+STRATEGY_TEMP_COPIES = {"max": 1, "mean": 1, "topk": 2}   # 전략별 (c, I, T) 크기 임시 배열 수 (topk는 정렬 / 누적합 버퍼 포함)
+
+
+# ────────────────────────────────
+# 1. 데이터 준비
+# ────────────────────────────────
+def load_dataset(path):
+    data = np.load(path)
+    templates = data["templates"].astype(np.float32)
+    if templates.ndim == 2:
+        templates = templates[:, None, :]
+    counts = data["template_counts"] if "template_counts" in data.files else np.full(len(templates), templates.shape[1])
+    return templates, counts.astype(np.int64), data["probes"].astype(np.float32), data["probe_labels"].astype(np.int64)
+
+
+def validate_dataset(templates, counts, probes, labels):
+    """template 수 / 라벨 범위 검사 (template이 0개인 사용자는 점수를 정의할 수 없으므로 거부)"""
+    num_ids, num_t, dim = templates.shape
+    if counts.shape != (num_ids,) or counts.max(initial=0) > num_t:
+        raise ValueError(f"template_counts는 길이 {num_ids}, 값 범위 1..{num_t}이어야 합니다.")
+    empty = np.flatnonzero(counts <= 0)
+    if len(empty):
+        raise ValueError(f"template이 없는 사용자 {len(empty)}명 (인덱스 {empty[:10].tolist()}...) - 데이터셋에서 제외해주세요.")
+    if probes.shape[1:] != (dim,):
+        raise ValueError(f"probe 차원 {probes.shape[1:]}이 template 차원 {dim}과 다릅니다.")
+    if len(labels) != len(probes) or labels.min(initial=0) < 0 or labels.max(initial=0) >= num_ids:
+        raise ValueError("probe_labels는 probe마다 하나씩, 0..I-1 범위여야 합니다.")
+
+
+def make_synthetic(num_identities, templates_per_id=5, probes_per_id=1, dim=512, noise=0.8, seed=0):
+    """사용자 중심 벡터 + 잡음으로 만든 합성 데이터 (처리 속도 / 메모리 확인용)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_identities, dim), dtype=np.float32)
+    templates = centers[:, None, :] + noise * rng.standard_normal((num_identities, templates_per_id, dim), dtype=np.float32)
+    labels = np.repeat(np.arange(num_identities), probes_per_id)
+    probes = centers[labels] + noise * rng.standard_normal((len(labels), dim), dtype=np.float32)
+    counts = np.full(num_identities, templates_per_id)
+    return templates, counts, probes, labels
+
+
+# ────────────────────────────────
+# 2. chunk 단위 점수 계산 + 히스토그램 누적
+# ────────────────────────────────
+def combine_templates(sims, mask, counts, strategy, top_k):
+    """(c, I, T) template 유사도 → (c, I) 사용자 점수"""
+    if strategy == "max":
+        return np.where(mask, sims, -np.inf).max(axis=2)
+    if strategy == "mean":
+        return np.where(mask, sims, 0.0).sum(axis=2) / counts
+    if strategy == "topk":
+        # 사용자마다 k_i = min(top_k, template 수)개를 평균 (template이 1개인 사용자 때문에 전체가 max가 되지 않도록)
+        # (임시 배열은 np.where 결과 하나만 만들고 부호 반전 / 정렬 / 누적합은 제자리에서 수행)
+        k = np.minimum(top_k, counts).astype(np.int64)                   # (1, I)
+        ordered = np.where(mask, sims, -np.inf)
+        np.negative(ordered, out=ordered)
+        ordered.sort(axis=2)
+        np.negative(ordered, out=ordered)                                # 내림차순, 빈 template(-inf)은 뒤로
+        np.cumsum(ordered, axis=2, out=ordered)                          # 앞 k_i개는 모두 실제 template
+        index = np.broadcast_to((k - 1)[:, :, None], (len(sims), k.shape[1], 1))
+        return np.take_along_axis(ordered, index, axis=2)[:, :, 0] / k
+    raise ValueError(f"알 수 없는 strategy: {strategy}")
+
+
+def to_bins(scores):
+    return np.clip(((scores + 1.0) * (NUM_BINS / 2)).astype(np.int64), 0, NUM_BINS - 1)
+
+
+def evaluate(templates, counts, probes, labels, strategies, top_k, max_memory_mb):
+    num_ids, num_t, dim = templates.shape
+    # 정규화한 gallery는 전치된 contiguous 사본 하나만 만들고 제자리에서 정규화
+    gallery_t = np.array(templates.reshape(-1, dim).T, dtype=np.float32, order="C")   # (d, I*T)
+    gallery_t /= np.maximum(np.sqrt(np.einsum("dn,dn->n", gallery_t, gallery_t)), 1e-12)   # norm(axis=0)은 제곱 사본을 만듦
+    probes = normalize_rows(probes)
+    mask = (np.arange(num_t)[None, :] < counts[:, None])[None, :, :]
+    counts_f = counts.astype(np.float32)[None, :]
+
+    # gallery를 뺀 나머지 메모리로 chunk 크기 결정
+    # probe당: (I*T) 유사도 행렬 + 가장 큰 전략의 (I*T) 임시 배열 수 + (I) 점수 / bin 배열
+    budget = max_memory_mb * 1024 * 1024 - gallery_t.nbytes
+    if budget <= 0:
+        print(f"⚠️ gallery({gallery_t.nbytes / 1024 / 1024:.0f} MB)가 --max-memory-mb보다 큽니다. probe 1개씩 처리합니다.")
+    temp_copies = max(STRATEGY_TEMP_COPIES.get(s, 1) for s in strategies)
+    bytes_per_probe = num_ids * num_t * 4 * (1 + temp_copies) + num_ids * (4 + 8 * 2)
+    chunk = max(1, int(budget // bytes_per_probe))
+
+    hist = {s: {"genuine": np.zeros(NUM_BINS, np.int64), "impostor": np.zeros(NUM_BINS, np.int64)} for s in strategies}
+    rank1 = {s: 0 for s in strategies}
+
+    started = time.perf_counter()
+    for start in range(0, len(probes), chunk):
+        p = probes[start:start + chunk]
+        y = labels[start:start + chunk]
+        sims = (p @ gallery_t).reshape(len(p), num_ids, num_t)
+        rows = np.arange(len(p))
+
+        for strategy in strategies:
+            scores = combine_templates(sims, mask, counts_f, strategy, top_k)
+            genuine_bins = to_bins(scores[rows, y])
+            all_bins = np.bincount(to_bins(scores).ravel(), minlength=NUM_BINS)
+            genuine_hist = np.bincount(genuine_bins, minlength=NUM_BINS)
+            hist[strategy]["genuine"] += genuine_hist
+            hist[strategy]["impostor"] += all_bins - genuine_hist
+            rank1[strategy] += int((scores.argmax(axis=1) == y).sum())
+
+        done = min(start + chunk, len(probes))
+        print(f"\r🔄 {done}/{len(probes)} probe 처리 ({time.perf_counter() - started:.1f}s)", end="", flush=True)
+    print()
+
+    return hist, rank1, chunk, time.perf_counter() - started
+
+
+# ────────────────────────────────
+# 3. FAR / FRR / 권장 임계값
+# ────────────────────────────────
+def roc_from_hist(genuine, impostor):
+    """임계값 t(구간 하한)에서 score >= t이면 수락: FAR = 수락된 impostor 비율, FRR = 거절된 genuine 비율"""
+    thresholds = np.arange(NUM_BINS) / (NUM_BINS / 2) - 1.0
+    far = impostor[::-1].cumsum()[::-1] / max(impostor.sum(), 1)
+    frr = (genuine.cumsum() - genuine) / max(genuine.sum(), 1)
+    return thresholds, far, frr
+
+
+def summarize(strategy, hist, rank1, num_probes, current_threshold):
+    thresholds, far, frr = roc_from_hist(hist["genuine"], hist["impostor"])
+    eer_idx = int(np.argmin(np.abs(far - frr)))
+
+    recommended = {}
+    for target in FAR_TARGETS:
+        candidates = np.nonzero(far <= target)[0]
+        if len(candidates):
+            i = int(candidates[0])
+            recommended[f"far<={target:g}"] = {
+                "threshold": round(float(thresholds[i]), 4),
+                "far": float(far[i]),
+                "frr": float(frr[i]),
+                # 정규화된 embedding 기준 같은 판정의 L2 거리 (sqrt(2 - 2cos))
+                "l2_equivalent": round(float(np.sqrt(max(0.0, 2 - 2 * thresholds[i]))), 4),
+            }
+
+    cur = int(np.searchsorted(thresholds, current_threshold))
+    return {
+        "strategy": strategy,
+        "genuine_pairs": int(hist["genuine"].sum()),
+        "impostor_pairs": int(hist["impostor"].sum()),
+        "rank1_accuracy": round(rank1 / max(num_probes, 1), 4),
+        "eer": round(float((far[eer_idx] + frr[eer_idx]) / 2), 5),
+        "eer_threshold": round(float(thresholds[eer_idx]), 4),
+        "current_threshold": {"threshold": current_threshold, "far": float(far[cur]), "frr": float(frr[cur])},
+        "recommended": recommended,
+    }, (thresholds, far, frr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="얼굴 인증 임계값 오프라인 평가")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dataset", help="평가용 .npz 파일")
+    source.add_argument("--synthetic", type=int, help="합성 데이터 사용자 수")
+    parser.add_argument("--strategies", default="max,mean,topk", help="template 결합 방식 (쉼표 구분)")
+    parser.add_argument("--top-k", type=int, default=2, help="topk 방식에서 평균할 template 수")
+    parser.add_argument("--max-memory-mb", type=int, default=1024, help="chunk 점수 행렬 메모리 상한")
+    parser.add_argument("--threshold", type=float, default=None, help="평가할 현재 임계값 (기본: config.THRESHOLD)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--roc-csv", help="전략별 ROC CSV 저장 경로 prefix (<prefix>_<strategy>.csv)")
+    args = parser.parse_args()
+
+    if args.threshold is None:
+        try:
+            from config import THRESHOLD
+            args.threshold = THRESHOLD
+        except Exception:
+            args.threshold = 0.5
+
+    if args.dataset:
+        templates, counts, probes, labels = load_dataset(args.dataset)
+    else:
+        templates, counts, probes, labels = make_synthetic(args.synthetic)
+
+    try:
+        validate_dataset(templates, counts, probes, labels)
+    except ValueError as e:
+        print(f"❌ 데이터셋 오류: {e}")
+        sys.exit(1)
+
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    print(f"📂 사용자 {templates.shape[0]}명 × template {templates.shape[1]}개, probe {len(probes)}개")
+
+    hist, rank1, chunk, elapsed = evaluate(templates, counts, probes, labels, strategies, args.top_k, args.max_memory_mb)
+    print(f"⏱️ 점수 계산 {elapsed:.1f}s (chunk {chunk} probe, gallery {templates.nbytes / 1024 / 1024:.0f} MB 포함)")
+
+    reports = []
+    for strategy in strategies:
+        report, (thresholds, far, frr) = summarize(strategy, hist[strategy], rank1[strategy], len(probes), args.threshold)
+        reports.append(report)
+
+        cur = report["current_threshold"]
+        print(f"\n📊 [{strategy}] rank-1 {report['rank1_accuracy']:.2%} / EER {report['eer']:.3%} (임계값 {report['eer_threshold']})")
+        print(f"  - 현재 임계값 {cur['threshold']}: FAR {cur['far']:.2e}, FRR {cur['frr']:.2%}")
+        for name, rec in report["recommended"].items():
+            print(f"  - {name}: 임계값 {rec['threshold']} (FRR {rec['frr']:.2%}, L2 {rec['l2_equivalent']})")
+
+        if args.roc_csv:
+            path = f"{args.roc_csv}_{strategy}.csv"
+            np.savetxt(path, np.column_stack([thresholds, far, frr, 1 - frr]), delimiter=",",
+                       header="threshold,far,frr,tar", comments="", fmt="%.6g")
+            print(f"  💾 ROC 저장: {path}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"elapsed_sec": round(elapsed, 2), "chunk_size": chunk, "results": reports}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+게이트 키오스크용 실시간 얼굴 인증 엔진
+
+verify_live.py / verify_live_supabase.py는 캡처 → app.get → 사용자별 Python 루프 비교 → 화면 출력을
+한 스레드에서 순서대로 처리하므로 FPS가 가장 느린 단계에 묶입니다.
+이 스크립트는 캡처 / 추론 / 출력을 각각 별도 스레드의 파이프라인 단계로 나누고,
+단계 사이에는 크기가 제한된 큐(가득 차면 가장 오래된 프레임을 버림)를 둡니다.
+비교는 GalleryIndex의 행렬곱으로 전체 사용자를 한 번에 계산합니다.
+
+사용:
+    python kiosk.py                                   # 웹캠(0번), Supabase 전체 사용자와 비교
+    python kiosk.py --target-user-id <uuid>           # 특정 사용자만 비교 (1:1)
+    python kiosk.py --source gate.mp4 --headless      # 비디오 파일로 화면 없이 벤치마크
+    python kiosk.py --source gate.mp4 --headless --gallery-npz gallery.npz --pace
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# ✅ 현재 파일 기준으로 루트 디렉토리를 sys.path에 등록
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from config import THRESHOLD
+from utils.similarity import GalleryIndex
+
+
+class DropOldestQueue:
+    """가득 차면 가장 오래된 항목을 버리는 bounded queue (실시간 처리에서 지연 누적 방지)"""
+
+    def __init__(self, maxsize):
+        self.items = deque(maxlen=maxsize)
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def get(self):
+        """다음 항목 반환 (큐가 닫히고 비어 있으면 None)"""
+        with self.cond:
+            while not self.items and not self.closed:
+                self.cond.wait()
+            return self.items.popleft() if self.items else None
+
+
+class StageStats:
+    def __init__(self):
+        self.latencies = []
+
+    def add(self, seconds):
+        self.latencies.append(seconds * 1000)
+
+    def summary(self):
+        if not self.latencies:
+            return "측정값 없음"
+        arr = np.array(self.latencies)
+        return (f"평균 {arr.mean():.1f}ms / p50 {np.percentile(arr, 50):.1f}ms / "
+                f"p95 {np.percentile(arr, 95):.1f}ms ({len(arr)}회)")
+
+
+def load_gallery(args):
+    """비교 대상 embedding 로드 (npz 파일 또는 Supabase)"""
+    if args.gallery_npz:
+        data = np.load(args.gallery_npz)
+        embeddings = {user_id: data[user_id] for user_id in data.files}
+    elif args.target_user_id:
+        from config import supabase
+        from utils.crypto_utils import decrypt_embedding
+
+        print(f"🔄 Supabase에서 {args.target_user_id} 사용자 embedding 로딩 중...")
+        records = supabase.table("face_embeddings").select("user_id, embedding_enc").eq("user_id", args.target_user_id).execute().data
+        embeddings = {r["user_id"].strip(): decrypt_embedding(r["embedding_enc"], verbose=False) for r in records}
+    else:
+        from services.face_service import load_registered_embeddings
+
+        # PostgREST 최대 행 수 제한에 잘리지 않도록 페이지 단위로 전체 조회
+        print("🔄 Supabase에서 등록된 embedding 로딩 중...")
+        embeddings = {user_id.strip(): emb for user_id, emb in load_registered_embeddings().items()}
+
+    if args.target_user_id:
+        embeddings = {k: v for k, v in embeddings.items() if k == args.target_user_id}
+
+    print(f"✅ {len(embeddings)}명의 임베딩 로드 완료")
+    return GalleryIndex(embeddings)
+
+
+class KioskPipeline:
+    def __init__(self, args, app, gallery):
+        self.args = args
+        self.app = app
+        self.gallery = gallery
+        self.frames = DropOldestQueue(args.queue_size)
+        self.results = DropOldestQueue(args.queue_size)
+        self.stop_event = threading.Event()
+        self.stats = {
+            "capture": StageStats(),
+            "inference": StageStats(),
+            "display": StageStats(),
+            "end_to_end": StageStats(),
+        }
+        self.captured = 0
+        self.displayed = 0
+
+    def capture_loop(self, cap):
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        frame_interval = 1.0 / fps
+        frame_id = 0
+        while not self.stop_event.is_set():
+            started = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            self.stats["capture"].add(time.perf_counter() - started)
+            self.frames.put((frame_id, time.perf_counter(), frame))
+            frame_id += 1
+            self.captured += 1
+            if self.args.max_frames and frame_id >= self.args.max_frames:
+                break
+            if self.args.pace:
+                # 비디오 파일을 원래 FPS로 재생해 실제 카메라 입력처럼 사용
+                time.sleep(max(0.0, frame_interval - (time.perf_counter() - started)))
+        cap.release()
+        self.frames.close()
+
+    def inference_loop(self):
+        while True:
+            item = self.frames.get()
+            if item is None:
+                break
+            frame_id, captured_at, frame = item
+
+            started = time.perf_counter()
+            faces = self.app.get(frame)
+            matches = []
+            if faces and len(self.gallery) > 0:
+                scores, user_ids = self.gallery.scores(np.stack([face.embedding for face in faces]))
+                best = scores.argmax(axis=1)
+                for face, idx, row in zip(faces, best, scores):
+                    score = float(row[idx])
+                    user_id = user_ids[idx] if score > THRESHOLD else "Unknown"
+                    matches.append((face.bbox.astype(int), user_id, score))
+            else:
+                matches = [(face.bbox.astype(int), "Unknown", 0.0) for face in faces]
+            self.stats["inference"].add(time.perf_counter() - started)
+
+            self.results.put((frame_id, captured_at, frame, matches))
+        self.results.close()
+
+    def display_loop(self):
+        """화면 출력 단계 (cv2.imshow는 메인 스레드에서 호출해야 하므로 메인 스레드에서 실행)"""
+        while True:
+            item = self.results.get()
+            if item is None:
+                break
+            frame_id, captured_at, frame, matches = item
+
+            started = time.perf_counter()
+            if not self.args.headless:
+                for bbox, user_id, score in matches:
+                    verified = user_id != "Unknown"
+                    color = (0, 255, 0) if verified else (0, 0, 255)
+                    cv2.rectangle(frame, tuple(bbox[:2]), tuple(bbox[2:]), color, 2)
+                    cv2.putText(frame, f"{user_id} ({score:.2f})", (bbox[0], bbox[1] - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+                cv2.imshow("Gate Kiosk", frame)
+                if cv2.waitKey(1) & 0xFF == 27:
+                    self.stop_event.set()
+            elif self.args.verbose:
+                for bbox, user_id, score in matches:
+                    print(f"[frame {frame_id}] {user_id} ({score:.2f})")
+            self.stats["display"].add(time.perf_counter() - started)
+            self.stats["end_to_end"].add(time.perf_counter() - captured_at)
+            self.displayed += 1
+
+            if self.stop_event.is_set():
+                break
+
+    def run(self, cap):
+        started = time.perf_counter()
+        capture_thread = threading.Thread(target=self.capture_loop, args=(cap,), daemon=True)
+        inference_thread = threading.Thread(target=self.inference_loop, daemon=True)
+        capture_thread.start()
+        inference_thread.start()
+
+        try:
+            self.display_loop()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_event.set()
+            capture_thread.join(timeout=2)
+            inference_thread.join(timeout=5)
+            if not self.args.headless:
+                cv2.destroyAllWindows()
+
+        self.report(time.perf_counter() - started)
+
+    def report(self, elapsed):
+        print("\n📊 키오스크 파이프라인 결과")
+        print(f"  - 처리 시간: {elapsed:.2f}s")
+        print(f"  - 캡처 프레임: {self.captured} / 출력 프레임: {self.displayed}")
+        print(f"  - 버려진 프레임: 캡처→추론 {self.frames.dropped}, 추론→출력 {self.results.dropped}")
+        print(f"  - end-to-end FPS: {self.displayed / elapsed if elapsed > 0 else 0:.2f}")
+        for name, stats in self.stats.items():
+            print(f"  - {name}: {stats.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="게이트 키오스크 실시간 얼굴 인증")
+    parser.add_argument("--source", default="0", help="웹캠 번호 또는 비디오 파일 경로 (기본: 0)")
+    parser.add_argument("--target-user-id", help="특정 사용자만 비교 (1:1 인증)")
+    parser.add_argument("--gallery-npz", help="Supabase 대신 사용할 embedding npz 파일 (키: user_id)")
+    parser.add_argument("--det-size", type=int, default=320, help="검출기 입력 크기 (기본: 320)")
+    parser.add_argument("--queue-size", type=int, default=2, help="단계 사이 큐 크기 (기본: 2)")
+    parser.add_argument("--max-frames", type=int, default=0, help="처리할 최대 프레임 수 (0: 제한 없음)")
+    parser.add_argument("--headless", action="store_true", help="화면 출력 없이 실행 (벤치마크용)")
+    parser.add_argument("--pace", action="store_true", help="비디오 파일을 원래 FPS 속도로 재생")
+    parser.add_argument("--verbose", action="store_true", help="headless 모드에서 프레임별 인식 결과 출력")
+    args = parser.parse_args()
+
+    gallery = load_gallery(args)
+    if args.target_user_id and len(gallery) == 0:
+        print(f"❌ {args.target_user_id} 사용자가 등록되어 있지 않습니다.")
+        return
+
+    # ✅ 모델 준비 (utils.io_utils가 이미 로드한 모델을 재사용해 프로세스당 한 번만 로드)
+    from utils.io_utils import app
+    if app is None:
+        print("❌ InsightFace 모델을 로드하지 못했습니다.")
+        return
+    app.prepare(ctx_id=0, det_size=(args.det_size, args.det_size))
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"❌ 입력을 열 수 없습니다: {args.source}")
+        return
+
+    print(f"🎥 키오스크 시작 (ESC: 종료) - 입력: {args.source}, 비교 대상: {len(gallery)}명")
+    KioskPipeline(args, app, gallery).run(cap)
+
+
+if __name__ == "__main__":
+    main()
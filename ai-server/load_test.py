@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+AI 서버 동시 접속 부하 테스트 스크립트
+
+FaceVerificationComponent를 쓰는 클라이언트 N명을 동시에 흉내 냅니다.
+  1) /face/load-user-embedding 1회 호출
+  2) 이후 --interval 초마다 /face/verify-frame 호출 (fixture JPEG 순환 사용)
+  3) (선택) 백그라운드로 /face/register 업로드를 초당 --register-rate 건 전송
+
+Supabase / Tickity 백엔드는 이 스크립트가 띄우는 stub 서버로 대체하므로
+실제 DB 없이 AI 서버 자체의 처리량만 측정할 수 있습니다.
+(stub은 PostgREST 페이지 조회(offset/limit)를 지원하고, 모든 가상 사용자가
+STUB_CONCERT_ID 콘서트 티켓을 가진 것으로 응답하므로 /face/prefetch-embeddings도 측정 가능)
+
+사용:
+    # stub 서버 + AI 서버(uvicorn)까지 함께 실행
+    python load_test.py --spawn-server --frames test_data/*.jpg --concurrency 1,4,16,32
+
+    # 이미 실행 중인 AI 서버 대상 (서버는 아래 환경변수로 stub에 연결되어 있어야 함)
+    #   SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_ROLE_KEY=stub.stub.stub
+    #   TICKITY_BACKEND_URL=http://127.0.0.1:4001
+    python load_test.py --server-url http://localhost:8000 --frames a.jpg b.jpg --video sample.mp4 --register-rate 0.2
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import httpx
+import numpy as np
+
+STUB_SERVICE_KEY = "stub.stub.stub"  # supabase 클라이언트의 JWT 형식 검사를 통과하는 더미 키
+
+
+# ────────────────────────────────
+# 1. Supabase / 백엔드 stub 서버
+# ────────────────────────────────
+STUB_CONCERT_ID = "00000000-0000-0000-0000-000000000001"  # stub 사용자 전원이 티켓을 가진 콘서트
+
+
+def make_supabase_handler(encrypted_embeddings):
+    """PostgREST의 face_embeddings / tickets 조회만 흉내 내는 핸들러 (offset/limit 또는 Range 페이지 지원)"""
+    user_ids = list(encrypted_embeddings)
+    embedding_rows = [
+        {"id": i + 1, "user_id": u, "embedding_enc": encrypted_embeddings[u], "created_at": "2025-01-01T00:00:00"}
+        for i, u in enumerate(user_ids)
+    ]
+    ticket_rows = [
+        {"id": i + 1, "user_id": u, "concert_id": STUB_CONCERT_ID, "is_cancelled": False}
+        for i, u in enumerate(user_ids)
+    ]
+
+    class SupabaseStubHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, data, status=200):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _page(self, rows, query):
+            """offset/limit 쿼리 파라미터 또는 Range 헤더만큼 잘라서 반환 (fetch_all_rows가 빈 페이지에서 멈추도록)"""
+            if "offset" in query or "limit" in query:
+                start = int(query.get("offset", ["0"])[0])
+                limit = int(query["limit"][0]) if "limit" in query else len(rows)
+                return rows[start:start + limit]
+            match = re.fullmatch(r"(\d+)-(\d*)", self.headers.get("Range", ""))
+            if match:
+                start = int(match.group(1))
+                end = int(match.group(2)) + 1 if match.group(2) else len(rows)
+                return rows[start:end]
+            return rows
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            query = parse_qs(parsed.query)
+            user_filter = query.get("user_id", [""])[0]
+
+            if parsed.path.endswith("/face_embeddings"):
+                if user_filter.startswith("eq."):
+                    wanted = {user_filter[3:]}
+                elif user_filter.startswith("in."):
+                    wanted = {u.strip('"') for u in user_filter[4:-1].split(",") if u}
+                else:
+                    wanted = None
+                rows = [r for r in embedding_rows if wanted is None or r["user_id"] in wanted]
+                return self._send_json(self._page(rows, query))
+
+            if parsed.path.endswith("/tickets"):
+                concert_filter = query.get("concert_id", [""])[0]
+                rows = [
+                    r for r in ticket_rows
+                    if not concert_filter.startswith("eq.") or r["concert_id"] == concert_filter[3:]
+                ]
+                return self._send_json(self._page(rows, query))
+
+            return self._send_json({"message": "not found"}, status=404)
+
+    return SupabaseStubHandler
+
+
+class BackendStubHandler(BaseHTTPRequestHandler):
+    """Tickity 백엔드의 /auth/face-register 응답만 흉내 냄"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = json.dumps({"success": True, "message": "stub 저장 완료"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub(handler, port):
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_stub_embeddings(num_users, fixture_embedding=None):
+    """가상 사용자 user1..userN의 암호화된 embedding 생성 (AI 서버와 같은 EMBEDDING_SECRET_KEY 필요)"""
+    sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+    from utils.crypto_utils import encrypt_embedding
+
+    rng = np.random.default_rng(42)
+    encrypted = {}
+    for i in range(1, num_users + 1):
+        embedding = fixture_embedding if fixture_embedding is not None else rng.normal(size=(5, 512))
+        encrypted[f"user{i}"] = encrypt_embedding(embedding)
+    return encrypted
+
+
+# ────────────────────────────────
+# 2. 가상 클라이언트
+# ────────────────────────────────
+class Recorder:
+    def __init__(self):
+        self.latencies = {"verify": [], "load": [], "register": []}
+        self.counts = {"verify": {}, "load": {}, "register": {}}
+
+    def record(self, kind, outcome, latency=None):
+        self.counts[kind][outcome] = self.counts[kind].get(outcome, 0) + 1
+        if latency is not None and outcome in ("ok", "rejected"):
+            self.latencies[kind].append(latency * 1000)
+
+
+def classify(response):
+    """응답을 ok / rejected(얼굴 미인식 등 정상 거절) / shed(503) / http_error로 분류"""
+    if response.status_code == 503:
+        return "shed"
+    if response.status_code != 200:
+        return "http_error"
+    try:
+        data = response.json()
+    except ValueError:
+        return "http_error"
+    return "ok" if data.get("success") else "rejected"
+
+
+async def timed_post(client, recorder, kind, url, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, **kwargs)
+        recorder.record(kind, classify(response), time.perf_counter() - started)
+    except httpx.HTTPError:
+        recorder.record(kind, "network_error")
+
+
+async def verification_client(client, args, recorder, user_id, frames, deadline, offset):
+    await timed_post(client, recorder, "load", f"{args.server_url}/face/load-user-embedding",
+                     data={"target_user_id": user_id})
+
+    # 클라이언트마다 시작 시점을 조금씩 어긋나게 해 실제 입장 흐름처럼 분산
+    await asyncio.sleep(offset)
+    i = 0
+    while time.perf_counter() < deadline:
+        tick = time.perf_counter()
+        frame = frames[i % len(frames)]
+        await timed_post(client, recorder, "verify", f"{args.server_url}/face/verify-frame",
+                         data={"target_user_id": user_id},
+                         files={"frame": ("frame.jpg", frame, "image/jpeg")})
+        i += 1
+        await asyncio.sleep(max(0.0, args.interval - (time.perf_counter() - tick)))
+
+
+async def registration_client(client, args, recorder, video, deadline):
+    interval = 1.0 / args.register_rate
+    tasks = []
+    i = 0
+    while time.perf_counter() < deadline:
+        i += 1
+        tasks.append(asyncio.create_task(timed_post(
+            client, recorder, "register", f"{args.server_url}/face/register",
+            data={"user_id": f"user{args.users + i}"},
+            files={"video": ("register.mp4", video, "video/mp4")},
+        )))
+        await asyncio.sleep(interval)
+    await asyncio.gather(*tasks)
+
+
+async def run_level(args, concurrency, frames, video):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency + 16, max_keepalive_connections=concurrency + 16)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        tasks = [
+            verification_client(client, args, recorder, f"user{(i % args.users) + 1}", frames, deadline,
+                                offset=args.interval * i / concurrency)
+            for i in range(concurrency)
+        ]
+        if video is not None and args.register_rate > 0:
+            tasks.append(registration_client(client, args, recorder, video, deadline))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+# ────────────────────────────────
+# 3. 결과 집계
+# ────────────────────────────────
+def summarize(kind, recorder, elapsed):
+    counts = recorder.counts[kind]
+    total = sum(counts.values())
+    if total == 0:
+        return None
+    latencies = np.array(recorder.latencies[kind]) if recorder.latencies[kind] else np.zeros(1)
+    errors = total - counts.get("ok", 0) - counts.get("rejected", 0)
+    return {
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+        "error_rate": round(errors / total, 4),
+        "shed": counts.get("shed", 0),
+        "outcomes": counts,
+    }
+
+
+def print_table(results):
+    print("\n📊 동시 접속별 /face/verify-frame 결과")
+    print(f"{'동시접속':>8} {'요청수':>8} {'처리량(rps)':>12} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'오류율':>8} {'503':>6}")
+    for level in results:
+        v = level["verify"]
+        if v is None:
+            continue
+        print(f"{level['concurrency']:>8} {v['requests']:>8} {v['throughput_rps']:>12} {v['p50_ms']:>9} "
+              f"{v['p95_ms']:>9} {v['p99_ms']:>9} {v['error_rate']:>8.2%} {v['shed']:>6}")
+    for level in results:
+        r = level["register"]
+        if r is not None:
+            print(f"  - 동시접속 {level['concurrency']}: register {r['requests']}건, "
+                  f"p95 {r['p95_ms']}ms, 오류율 {r['error_rate']:.2%}")
+
+
+def wait_for_server(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/docs", timeout=2).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(1)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI 서버 동시 접속 부하 테스트")
+    parser.add_argument("--server-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--frames", nargs="+", required=True, help="verify-frame에 보낼 JPEG 파일들 (glob 가능)")
+    parser.add_argument("--video", help="register에 보낼 비디오 파일")
+    parser.add_argument("--concurrency", default="1,4,16", help="쉼표로 구분된 동시 클라이언트 수 목록")
+    parser.add_argument("--duration", type=float, default=30, help="동시 접속 단계별 측정 시간(초)")
+    parser.add_argument("--interval", type=float, default=1.0, help="클라이언트별 verify-frame 호출 간격(초)")
+    parser.add_argument("--register-rate", type=float, default=0.0, help="초당 register 업로드 수")
+    parser.add_argument("--users", type=int, default=100, help="stub DB의 가상 사용자 수")
+    parser.add_argument("--fixture-embedding", help="stub 사용자 embedding으로 쓸 .npy (fixture 얼굴과 일치시키려면 지정)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--no-stubs", action="store_true", help="stub 서버를 띄우지 않음")
+    parser.add_argument("--supabase-port", type=int, default=54321)
+    parser.add_argument("--backend-port", type=int, default=4001)
+    parser.add_argument("--spawn-server", action="store_true", help="stub에 연결된 AI 서버(uvicorn)를 직접 실행")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    frame_paths = [p for pattern in args.frames for p in sorted(glob.glob(pattern))]
+    if not frame_paths:
+        print("❌ fixture JPEG를 찾을 수 없습니다.")
+        return
+    frames = [open(p, "rb").read() for p in frame_paths]
+    video = open(args.video, "rb").read() if args.video else None
+
+    stubs = []
+    if not args.no_stubs:
+        fixture = np.load(args.fixture_embedding) if args.fixture_embedding else None
+        embeddings = build_stub_embeddings(args.users, fixture)
+        stubs.append(start_stub(make_supabase_handler(embeddings), args.supabase_port))
+        stubs.append(start_stub(BackendStubHandler, args.backend_port))
+        print(f"✅ stub 서버 실행: Supabase :{args.supabase_port}, 백엔드 :{args.backend_port} ({args.users}명)")
+
+    server = None
+    if args.spawn_server:
+        port = urlparse(args.server_url).port or 8000
+        env = {
+            **os.environ,
+            "SUPABASE_URL": f"http://127.0.0.1:{args.supabase_port}",
+            "SUPABASE_SERVICE_ROLE_KEY": STUB_SERVICE_KEY,
+            "TICKITY_BACKEND_URL": f"http://127.0.0.1:{args.backend_port}",
+            "SERVER_IP": os.getenv("SERVER_IP", "127.0.0.1"),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+             "--workers", str(args.server_workers), "--log-level", "warning"],
+            cwd=os.path.abspath(os.path.dirname(__file__)), env=env,
+        )
+        print("🔄 AI 서버 시작 대기 중...")
+        if not wait_for_server(args.server_url):
+            print("❌ AI 서버가 시작되지 않았습니다.")
+            server.terminate()
+            return
+
+    results = []
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            print(f"🚀 동시 접속 {concurrency}명 측정 중 ({args.duration:.0f}s)...")
+            recorder, elapsed = asyncio.run(run_level(args, concurrency, frames, video))
+            results.append({
+                "concurrency": concurrency,
+                "elapsed_sec": round(elapsed, 2),
+                "load": summarize("load", recorder, elapsed),
+                "verify": summarize("verify", recorder, elapsed),
+                "register": summarize("register", recorder, elapsed),
+            })
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        for stub in stubs:
+            stub.shutdown()
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
-from config import FRONTEND_URL
-from routers import face
+from config import FRONTEND_URL, REGISTRATION_WORKERS, SHARD_INDEX, DUPLICATE_CHECK_MODE
+from routers import face, shard
 from fastapi.staticfiles import StaticFiles
+from services.registration_jobs import RegistrationWorkerPool, init_job_store
+from services.prefetch_jobs import init_prefetch_store
+from services.shard_service import run_shard_gallery_sync
+from services.face_service import warm_registered_gallery
+import asyncio
+import threading
 
 app = FastAPI()
 
@@ -27,4 +33,38 @@ app.add_middleware(
 
 # Face API 라우터 등록
 app.include_router(face.router, prefix="/face", tags=["Face API"])
-app.mount("/static", StaticFiles(directory="static"), name="static")
\ No newline at end of file
+app.include_router(shard.router, prefix="/shard", tags=["Shard API"])
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
+# 얼굴 등록 job worker (REGISTRATION_WORKERS=0이면 별도 프로세스에서만 처리)
+registration_workers = RegistrationWorkerPool(REGISTRATION_WORKERS)
+
+@app.on_event("startup")
+async def start_registration_workers():
+    init_job_store()
+    init_prefetch_store()
+    if REGISTRATION_WORKERS > 0:
+        # 같은 프로세스의 verify 요청과 CPU를 나눠 쓰므로 admission controller의 register 슬롯을 받아 처리
+        registration_workers.start(admission=face.admission, loop=asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+def stop_registration_workers():
+    registration_workers.stop()
+
+@app.on_event("shutdown")
+def close_embedding_cache():
+    # 공유 embedding 캐시 연결 해제 (마지막으로 종료하는 worker가 세그먼트 삭제)
+    if hasattr(face.embedding_cache, "close"):
+        face.embedding_cache.close()
+
+@app.on_event("startup")
+def start_shard_gallery_load():
+    # 샤드 노드는 담당 gallery를 백그라운드로 적재하고 SHARD_REFRESH_SEC마다 변경분 반영 (적재 중에도 서버는 응답)
+    if SHARD_INDEX is not None:
+        threading.Thread(target=run_shard_gallery_sync, name="shard-gallery-sync", daemon=True).start()
+
+@app.on_event("startup")
+def start_duplicate_gallery_load():
+    # 중복 얼굴 검사를 쓰면 전체 등록 사용자 gallery를 미리 적재
+    if DUPLICATE_CHECK_MODE in ("flag", "block"):
+        threading.Thread(target=warm_registered_gallery, name="duplicate-gallery-load", daemon=True).start()
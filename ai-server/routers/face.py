@@ -1,16 +1,24 @@
-from fastapi import APIRouter, UploadFile, File, Form, Request
+from fastapi import APIRouter, UploadFile, File, Form, Request, BackgroundTasks
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from services.face_service import fetch_registered_embeddings, register_user_face_db, verify_user_identity, register_user_face
-from utils.io_utils import extract_embedding_from_image
+from services.face_service import prefetch_concert_embeddings
+from services.registration_jobs import enqueue_registration, get_job
+from services.prefetch_jobs import create_prefetch_job, get_prefetch_job
+from utils.io_utils import extract_embedding_with_info, check_frame_quality
 from uuid import uuid4
+from typing import Optional
 from utils.similarity import cosine_similarity
+from utils.shared_cache import create_embedding_cache, cache_nbytes
+from utils.admission import create_admission_controller
 from config import THRESHOLD
 import numpy as np
 import hashlib
 
 router = APIRouter()
 embedding_store = {}
-embedding_cache = {}
+embedding_cache = create_embedding_cache()  # SHARED_EMBEDDING_CACHE=1이면 worker 간 공유 메모리
+admission = create_admission_controller()
 
 
 @router.post("/load-user-embedding")
@@ -38,6 +46,54 @@ async def load_user_embedding(target_user_id: str = Form(...)):
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@router.post("/prefetch-embeddings")
+async def prefetch_embeddings(
+    background_tasks: BackgroundTasks,
+    concert_id: Optional[str] = Form(None),
+    user_ids: Optional[str] = Form(None)  # 쉼표로 구분된 user_id 목록
+):
+    """
+    입장 전 여러 사용자의 embedding을 batch로 미리 embedding_cache에 적재
+    - concert_id: 해당 콘서트 티켓 보유자 전체
+    - user_ids: 쉼표로 구분된 user_id 목록
+    진행 상황은 GET /prefetch-embeddings/{job_id}로 조회합니다.
+    """
+    from services.face_service import validate_uuid_or_test_id
+
+    if not concert_id and not user_ids:
+        return {"success": False, "error": "concert_id 또는 user_ids가 필요합니다."}
+
+    try:
+        explicit = list(dict.fromkeys(
+            validate_uuid_or_test_id(u.strip()) for u in (user_ids or "").split(",") if u.strip()
+        ))
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    # 콘서트 티켓 보유자 조회(Supabase 동기 호출, 수만 건)는 백그라운드 작업에서 수행
+    # 진행 상황은 worker 간 공유되는 job 저장소에 기록 (다른 worker가 조회 요청을 받아도 응답 가능)
+    progress = await run_in_threadpool(create_prefetch_job, None if concert_id else len(explicit))
+    background_tasks.add_task(prefetch_concert_embeddings, concert_id, explicit, embedding_cache, progress)
+
+    return {"success": True, "job_id": progress.job_id, "total": progress["total"]}
+
+@router.get("/prefetch-embeddings/{job_id}")
+async def prefetch_embeddings_status(job_id: str):
+    """
+    embedding prefetch 작업 진행 상황 및 캐시 메모리 사용량 조회
+    """
+    progress = await run_in_threadpool(get_prefetch_job, job_id)
+    if progress is None:
+        return {"success": False, "error": "존재하지 않는 prefetch 작업입니다."}
+
+    return {
+        "success": True,
+        "job_id": job_id,
+        **progress,
+        "cache_users": len(embedding_cache),
+        "cache_bytes": cache_nbytes(embedding_cache),
+    }
+
 @router.post("/register")
 async def register_face_to_db(
     user_id: str = Form(...),  # ✅ user_id Form으로 받기
@@ -46,9 +102,41 @@ async def register_face_to_db(
     """
     사용자 얼굴 임베딩을 추출하고 DB에 저장 (개선된 함수 사용)
     """
-    result = await register_user_face_db(user_id, video)
+    async with admission.slot("register"):
+        result = await register_user_face_db(user_id, video)
     return result
 
+@router.post("/register-async")
+async def register_face_async(
+    user_id: str = Form(...),
+    video: UploadFile = File(...)
+):
+    """
+    얼굴 등록을 job으로 접수하고 job_id를 바로 반환
+    - 실제 처리(embedding 추출, KMeans, 백엔드 저장)는 등록 worker가 수행
+    - 진행 상황은 GET /register-jobs/{job_id}로 조회
+    """
+    from services.face_service import validate_uuid_or_test_id
+
+    try:
+        validated_user_id = validate_uuid_or_test_id(user_id)
+        video_bytes = await video.read()
+        job_id = await run_in_threadpool(enqueue_registration, validated_user_id, video_bytes)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    return {"success": True, "job_id": job_id, "status": "queued"}
+
+@router.get("/register-jobs/{job_id}")
+async def register_job_status(job_id: str):
+    """
+    얼굴 등록 job 상태 조회 (queued / running / done / failed, 진행률, 결과)
+    """
+    job = await run_in_threadpool(get_job, job_id)
+    if job is None:
+        return {"success": False, "error": "존재하지 않는 등록 job입니다."}
+    return {"success": True, **job}
+
 @router.post("/verify-frame")
 async def verify_frame(
     frame: UploadFile = File(...),
@@ -58,9 +146,22 @@ async def verify_frame(
     특정 사용자의 얼굴 인증 - embedding_cache에 저장된 대상 사용자 ID의 embedding과 비교
     """
     frame_bytes = await frame.read()
-    embedding = extract_embedding_from_image(frame_bytes)
+
+    # ✅ 모델 호출 전 품질 사전 검사 (흐림/노출/얼굴 크기) - 디코딩/Haar도 CPU 작업이므로 threadpool에서 실행
+    quality = await run_in_threadpool(check_frame_quality, frame_bytes)
+    if not quality["ok"]:
+        return {
+            "success": False,
+            "verified": False,
+            "error": quality["message"],
+            "reason": quality["reason"],
+            "quality": quality["metrics"],
+        }
+
+    async with admission.slot("verify"):
+        embedding, ingestion = await run_in_threadpool(extract_embedding_with_info, frame_bytes, "verify")
     if embedding is None:
-        return {"success": False, "verified": False, "error": "얼굴을 감지하지 못했습니다."}
+        return {"success": False, "verified": False, "error": "얼굴을 감지하지 못했습니다.", "reason": "no_face", "ingestion": ingestion}
 
     # ✅ 캐시에서 embedding 가져오기
     db_embedding = embedding_cache.get(target_user_id)
@@ -96,7 +197,8 @@ async def verify_frame(
         "user_id": target_user_id if verified else "Unknown",
         "score": float(score),
         "threshold": float(THRESHOLD),
-        "message": f"유사도 {score:.4f} (임계값: {THRESHOLD})"
+        "message": f"유사도 {score:.4f} (임계값: {THRESHOLD})",
+        "ingestion": ingestion
     }
 
     if verified and face_hash:
@@ -110,12 +212,19 @@ async def verify_general(frame: UploadFile = File(...)):
     일반 얼굴 인증 - 전체 DB에서 최고 유사도 찾기 (개선된 함수 사용)
     """
     frame_bytes = await frame.read()
-    # ✅ 실시간 프레임(image/jpeg) 처리에 맞게 수정
-    embedding = extract_embedding_from_image(frame_bytes)
-    if embedding is None:
-        return {"success": False, "user_id": "Unknown", "score": 0.0}
 
-    db_embeddings = fetch_registered_embeddings()
+    quality = await run_in_threadpool(check_frame_quality, frame_bytes)
+    if not quality["ok"]:
+        return {"success": False, "user_id": "Unknown", "score": 0.0, "reason": quality["reason"], "error": quality["message"]}
+
+    async with admission.slot("identify"):
+        # ✅ 실시간 프레임(image/jpeg) 처리에 맞게 수정
+        embedding, ingestion = await run_in_threadpool(extract_embedding_with_info, frame_bytes, "identify")
+        if embedding is None:
+            return {"success": False, "user_id": "Unknown", "score": 0.0, "reason": "no_face", "ingestion": ingestion}
+
+        db_embeddings = await run_in_threadpool(fetch_registered_embeddings)
+
     best_match = "Unknown"
     best_score = -1
 
@@ -132,5 +241,13 @@ async def verify_general(frame: UploadFile = File(...)):
     return {
         "success": True,
         "user_id": best_match,
-        "score": float(best_score)
+        "score": float(best_score),
+        "ingestion": ingestion
     }
+
+@router.get("/admission-stats")
+async def admission_stats():
+    """
+    요청 종류별 실행/대기 수, 거절 횟수, 평균 대기/처리 시간 조회
+    """
+    return admission.stats()
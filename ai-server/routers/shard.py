@@ -0,0 +1,100 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import List
+import numpy as np
+
+from config import THRESHOLD, SHARD_INDEX, SHARD_COUNT, SHARD_URLS, SHARD_TOP_K
+from routers.face import admission
+from services import shard_service
+from utils.io_utils import extract_embedding_with_info, check_frame_quality
+
+router = APIRouter()
+
+
+class ShardSearchRequest(BaseModel):
+    embedding: List[float]
+    k: int = SHARD_TOP_K
+
+
+@router.post("/search")
+async def shard_search(request: ShardSearchRequest):
+    """
+    샤드 노드: 자기 gallery에서 probe embedding의 top-k 사용자 검색
+    - gallery 적재 전 / 적재 실패 상태면 503 (코디네이터가 이 샤드를 failed로 보고하고 partial 응답)
+    """
+    if not shard_service.is_ready():
+        raise HTTPException(
+            status_code=503,
+            detail=f"샤드 gallery가 준비되지 않았습니다 (status={shard_service.shard_state['status']}).",
+        )
+
+    matches = await run_in_threadpool(
+        shard_service.search_local, np.asarray(request.embedding, dtype=np.float32), request.k
+    )
+    return {
+        "shard_index": SHARD_INDEX,
+        "shard_count": SHARD_COUNT,
+        "gallery_size": len(shard_service.shard_gallery),
+        "matches": matches,
+    }
+
+
+@router.post("/reload")
+async def shard_reload():
+    """
+    샤드 노드: 담당 사용자 embedding을 DB에서 전체 다시 적재
+    (평소에는 SHARD_REFRESH_SEC마다 새 등록 / 재등록 / 삭제분만 자동 반영)
+    """
+    try:
+        await run_in_threadpool(shard_service.load_shard_gallery)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    return {"success": True, "gallery_size": len(shard_service.shard_gallery)}
+
+
+@router.get("/status")
+async def shard_status():
+    return {
+        "shard_index": SHARD_INDEX,
+        "shard_count": SHARD_COUNT,
+        "shard_urls": SHARD_URLS,
+        "gallery_size": len(shard_service.shard_gallery),
+        **shard_service.shard_state,
+    }
+
+
+@router.post("/identify")
+async def shard_identify(frame: UploadFile = File(...)):
+    """
+    코디네이터: probe embedding을 한 번만 계산하고 SHARD_URLS의 모든 샤드에 검색을 분산한 뒤 top-k 병합
+    """
+    if not SHARD_URLS:
+        return {"success": False, "user_id": "Unknown", "score": 0.0, "error": "SHARD_URLS가 설정되지 않았습니다."}
+
+    frame_bytes = await frame.read()
+
+    quality = await run_in_threadpool(check_frame_quality, frame_bytes)
+    if not quality["ok"]:
+        return {"success": False, "user_id": "Unknown", "score": 0.0, "reason": quality["reason"], "error": quality["message"]}
+
+    async with admission.slot("identify"):
+        embedding, ingestion = await run_in_threadpool(extract_embedding_with_info, frame_bytes, "identify")
+    if embedding is None:
+        return {"success": False, "user_id": "Unknown", "score": 0.0, "reason": "no_face", "ingestion": ingestion}
+
+    matches, shards = await shard_service.scatter_gather_search(embedding, SHARD_TOP_K)
+
+    best = matches[0] if matches else {"user_id": "Unknown", "score": 0.0}
+    verified = best["score"] >= THRESHOLD
+
+    return {
+        "success": True,
+        "user_id": best["user_id"] if verified else "Unknown",
+        "score": float(best["score"]),
+        "threshold": float(THRESHOLD),
+        "matches": matches,
+        "shards": shards,
+        "partial": len(shards["responded"]) < shards["requested"],
+        "ingestion": ingestion,
+    }
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+샤딩 식별 모드를 로컬 프로세스 여러 개로 실행하는 스크립트
+
+  - 샤드 노드 N개: 포트 base+1 .. base+N (SHARD_INDEX=0..N-1, SHARD_COUNT=N)
+  - 코디네이터 1개: 포트 base (SHARD_URLS=샤드 노드 주소 목록)
+
+사용:
+    python run_shards.py --shards 3                 # 코디네이터 :8000, 샤드 :8001~8003
+    curl -F "frame=@face.jpg" http://127.0.0.1:8000/shard/identify
+    curl http://127.0.0.1:8001/shard/status
+
+샤드 노드는 시작 시 담당 gallery를 적재하고, 이후 SHARD_REFRESH_SEC(기본 60초)마다 변경분만 반영합니다.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+def spawn(port, env_overrides):
+    env = {**os.environ, "SERVER_IP": os.getenv("SERVER_IP", "127.0.0.1"), **env_overrides}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=os.path.abspath(os.path.dirname(__file__)),
+        env=env,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 샤드 클러스터 실행")
+    parser.add_argument("--shards", type=int, default=2, help="샤드 노드 수")
+    parser.add_argument("--base-port", type=int, default=8000, help="코디네이터 포트 (샤드는 +1부터)")
+    parser.add_argument("--timeout", type=float, default=1.0, help="코디네이터의 샤드 응답 deadline(초)")
+    args = parser.parse_args()
+
+    shard_urls = [f"http://127.0.0.1:{args.base_port + i + 1}" for i in range(args.shards)]
+    processes = []
+    for i in range(args.shards):
+        processes.append(spawn(args.base_port + i + 1, {
+            "SHARD_INDEX": str(i),
+            "SHARD_COUNT": str(args.shards),
+            "REGISTRATION_WORKERS": "0",
+        }))
+    processes.append(spawn(args.base_port, {
+        "SHARD_URLS": ",".join(shard_urls),
+        "SHARD_TIMEOUT_SEC": str(args.timeout),
+    }))
+
+    print(f"✅ 코디네이터: http://127.0.0.1:{args.base_port}")
+    for i, url in enumerate(shard_urls):
+        print(f"  - 샤드 {i}: {url}")
+    print("Ctrl+C로 전체 종료")
+
+    try:
+        while all(p.poll() is None for p in processes):
+            time.sleep(1)
+        print("⚠️ 종료된 프로세스가 있어 전체를 종료합니다.")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 import uuid
+import numpy as np
 from utils.io_utils import extract_embedding_from_video_kmeans
 from utils.crypto_utils import encrypt_embedding, decrypt_embedding
-from utils.similarity import cosine_similarity
-from config import supabase, THRESHOLD
+from utils.similarity import cosine_similarity, GalleryIndex
+from config import supabase, THRESHOLD, DUPLICATE_CHECK_MODE, DUPLICATE_THRESHOLD, DUPLICATE_GALLERY_TTL_SEC
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 import os
+import threading
+import time
 import requests
 
 def validate_uuid_or_test_id(user_id: str) -> str:
@@ -23,17 +27,7 @@ def validate_uuid_or_test_id(user_id: str) -> str:
 def fetch_registered_embeddings():
     """Supabase에서 등록된 얼굴 임베딩들을 가져오기"""
     try:
-        response = supabase.table("face_embeddings").select("user_id, embedding_enc").execute()
-        embeddings = {}
-        
-        for record in response.data:
-            user_id = record['user_id']
-            encrypted_embedding = record['embedding_enc']
-            
-            # 임베딩 복호화
-            decrypted_embedding = decrypt_embedding(encrypted_embedding)
-            embeddings[user_id] = decrypted_embedding
-            
+        embeddings = load_registered_embeddings()
         print(f"✅ {len(embeddings)}개의 등록된 얼굴 임베딩을 불러왔습니다.")
         return embeddings
         
@@ -41,18 +35,262 @@ def fetch_registered_embeddings():
         print(f"❌ 임베딩 로드 실패: {e}")
         return {}
 
+def load_registered_embeddings():
+    """
+    등록된 전체 사용자 embedding을 페이지 단위로 조회/복호화
+    - 조회 실패는 빈 결과로 바꾸지 않고 그대로 예외 발생 (복호화 실패한 사용자만 건너뜀)
+    """
+    records = fetch_all_rows(lambda: supabase.table("face_embeddings").select("user_id, embedding_enc").order("id"))
+    embeddings = {}
+    for record in records:
+        try:
+            embeddings[record["user_id"]] = decrypt_embedding(record["embedding_enc"], verbose=False)
+        except Exception as e:
+            print(f"⚠️ 사용자 {record['user_id']}의 임베딩 복호화 실패: {e}")
+    return embeddings
+
+PREFETCH_BATCH_SIZE = 200
+BACKEND_REQUEST_TIMEOUT_SEC = 30
+SUPABASE_PAGE_SIZE = 1000
+
+def fetch_all_rows(build_query, page_size: int = SUPABASE_PAGE_SIZE):
+    """
+    PostgREST max-rows 제한(기본 1000행)에 잘리지 않도록 .range()로 끝까지 페이지 조회
+    - build_query: 페이지마다 새 query를 만드는 함수 (페이지 순서가 고정되도록 order 포함)
+    - 서버 max-rows가 page_size보다 작아도 빠짐없이 읽도록 빈 페이지가 나올 때까지 진행
+    """
+    rows = []
+    while True:
+        page = build_query().range(len(rows), len(rows) + page_size - 1).execute().data
+        if not page:
+            return rows
+        rows.extend(page)
+
+def fetch_concert_user_ids(concert_id: str):
+    """특정 콘서트의 (취소되지 않은) 티켓 보유자 user_id 목록 조회 (중복 제거, 조회 순서 유지)"""
+    records = fetch_all_rows(
+        lambda: supabase.table("tickets").select("user_id, is_cancelled").eq("concert_id", concert_id).order("id")
+    )
+    return list(dict.fromkeys(r["user_id"] for r in records if not r.get("is_cancelled")))
+
+def prefetch_concert_embeddings(concert_id, user_ids, cache: dict, progress: dict):
+    """
+    prefetch 백그라운드 작업 본체 - 콘서트 티켓 보유자 조회도 요청 처리(event loop) 밖에서 수행
+    - user_ids: 요청에서 직접 지정한(이미 검증된) user_id 목록
+    """
+    progress["status"] = "resolving"
+    try:
+        targets = fetch_concert_user_ids(concert_id) if concert_id else []
+        targets = list(dict.fromkeys([*targets, *user_ids]))
+    except Exception as e:
+        progress.update({"status": "failed", "error": str(e)})
+        print(f"❌ prefetch 대상 조회 실패: {e}")
+        return progress
+    return prefetch_user_embeddings(targets, cache, progress)
+
+def prefetch_user_embeddings(user_ids, cache: dict, progress: dict, batch_size: int = PREFETCH_BATCH_SIZE):
+    """
+    여러 사용자의 embedding을 batch 단위(in_ 쿼리)로 조회/복호화하여 cache에 미리 적재
+    - progress dict에 진행 상황(loaded / missing / failed / evicted / bytes)을 갱신합니다.
+    - 크기가 고정된 공유 캐시보다 대상이 많으면 적재한 사용자를 스스로 교체하게 되므로 시작하지 않습니다.
+    """
+    capacity = getattr(cache, "n_slots", None)
+    evictions_before = getattr(cache, "evictions", 0)
+    progress.update({
+        "status": "running",
+        "total": len(user_ids),
+        "processed": 0,
+        "loaded": 0,
+        "missing": 0,
+        "failed": 0,
+        "evicted": 0,
+        "bytes": 0,
+    })
+
+    if capacity is not None and len(user_ids) > capacity:
+        progress.update({
+            "status": "failed",
+            "error": f"대상 {len(user_ids)}명이 공유 캐시 슬롯 수({capacity})보다 많습니다. EMBEDDING_SHM_SLOTS를 늘려주세요.",
+        })
+        print(f"❌ embedding prefetch 거부: {progress['error']}")
+        return progress
+
+    try:
+        for start in range(0, len(user_ids), batch_size):
+            chunk = user_ids[start:start + batch_size]
+            response = supabase.table("face_embeddings").select("user_id, embedding_enc").in_("user_id", chunk).execute()
+
+            found = set()
+            for record in response.data:
+                user_id = record["user_id"]
+                found.add(user_id)
+                try:
+                    embedding = decrypt_embedding(record["embedding_enc"], verbose=False)
+                    cache[user_id] = embedding
+                except Exception as e:
+                    # 복호화 실패 / 캐시 저장 실패는 해당 사용자만 건너뜀
+                    print(f"⚠️ 사용자 {user_id}의 임베딩 적재 실패: {e}")
+                    progress["failed"] += 1
+                    continue
+                progress["loaded"] += 1
+                progress["bytes"] += int(embedding.nbytes)
+
+            progress["missing"] += len([u for u in chunk if u not in found])
+            progress["processed"] += len(chunk)
+            progress["evicted"] = getattr(cache, "evictions", 0) - evictions_before
+
+        progress["status"] = "done"
+        print(f"✅ embedding prefetch 완료: {progress['loaded']}/{progress['total']}명 ({progress['bytes'] / 1024:.1f} KB)")
+        if progress["evicted"]:
+            print(f"⚠️ prefetch 중 캐시 슬롯 부족으로 {progress['evicted']}명이 교체되었습니다. EMBEDDING_SHM_SLOTS를 늘려주세요.")
+    except Exception as e:
+        progress["status"] = "failed"
+        progress["error"] = str(e)
+        print(f"❌ embedding prefetch 실패: {e}")
+
+    return progress
+
+GALLERY_RETRY_SEC = 30
+
+registered_gallery = None
+registered_gallery_loaded_at = 0.0
+_gallery_lock = threading.Lock()        # 전체 재적재는 한 번에 하나만
+_gallery_refresh_attempted_at = 0.0
+_recent_registrations = {}              # user_id → (등록 시각, embeddings): 재적재 중 등록분 보존용
+
+def _rebuild_registered_gallery():
+    """
+    전체 gallery를 lock 밖(조회/복호화는 새 객체에)에서 만든 뒤 교체
+    - 만드는 동안 이 프로세스에서 등록된 사용자는 교체 직전에 다시 add
+    """
+    global registered_gallery, registered_gallery_loaded_at
+    started = time.time()
+    gallery = GalleryIndex(load_registered_embeddings())
+    for user_id, (registered_at, embeddings) in list(_recent_registrations.items()):
+        if registered_at >= started:
+            gallery.add(user_id, embeddings)
+        else:
+            _recent_registrations.pop(user_id, None)
+    registered_gallery, registered_gallery_loaded_at = gallery, time.time()
+    print(f"✅ 중복 검사 gallery 적재 완료: {len(gallery)}명 ({time.time() - started:.1f}s)")
+    return gallery
+
+def _refresh_registered_gallery():
+    try:
+        _rebuild_registered_gallery()
+    except Exception as e:
+        print(f"⚠️ 중복 검사 gallery 갱신 실패, 기존 gallery 유지: {e}")
+    finally:
+        _gallery_lock.release()
+
+def get_registered_gallery():
+    """
+    중복 검사용 전체 등록 사용자 GalleryIndex
+    - 처음에는 적재될 때까지 기다리고, 적재에 실패하면 예외 발생 (빈 gallery로 대체하지 않음)
+    - TTL이 지나면 백그라운드 스레드에서 다시 적재하고, 그동안은 기존 gallery로 바로 검사
+    - 이 프로세스에서 등록한 사용자는 등록 즉시 add되므로 TTL은 다른 worker 등록분 반영용
+    """
+    global _gallery_refresh_attempted_at
+    gallery = registered_gallery
+    if gallery is None:
+        with _gallery_lock:
+            return registered_gallery if registered_gallery is not None else _rebuild_registered_gallery()
+
+    now = time.time()
+    if (now - registered_gallery_loaded_at > DUPLICATE_GALLERY_TTL_SEC
+            and now - _gallery_refresh_attempted_at > GALLERY_RETRY_SEC
+            and _gallery_lock.acquire(blocking=False)):
+        _gallery_refresh_attempted_at = now
+        threading.Thread(target=_refresh_registered_gallery, name="duplicate-gallery-refresh", daemon=True).start()
+    return gallery
+
+def warm_registered_gallery():
+    """서버 시작 시 백그라운드에서 미리 적재 (첫 등록 요청이 전체 적재를 기다리지 않도록)"""
+    try:
+        get_registered_gallery()
+    except Exception as e:
+        print(f"⚠️ 중복 검사 gallery 사전 적재 실패 (첫 등록 시 다시 시도): {e}")
+
+def add_registered_face(user_id: str, embeddings):
+    """등록 성공한 사용자를 중복 검사 gallery에 바로 반영"""
+    _recent_registrations[user_id] = (time.time(), embeddings)
+    if registered_gallery is not None:
+        registered_gallery.add(user_id, embeddings)
+
+def find_duplicate_faces(user_id: str, embeddings, threshold: float = DUPLICATE_THRESHOLD, k: int = 3):
+    """
+    새로 등록할 template들을 기존 전체 gallery와 한 번의 행렬곱으로 비교하여
+    다른 user_id 중 threshold 이상인 후보를 [(user_id, score), ...]로 반환 (본인 재등록은 제외)
+    """
+    gallery = get_registered_gallery()
+    scores, user_ids = gallery.scores(embeddings)
+    if len(user_ids) == 0:
+        return []
+    if scores.ndim == 2:
+        scores = scores.max(axis=0)
+
+    candidates = [
+        (user_ids[i], float(scores[i]))
+        for i in np.nonzero(scores >= threshold)[0]
+        if user_ids[i] != user_id
+    ]
+    return sorted(candidates, key=lambda c: -c[1])[:k]
+
 async def register_user_face_db(user_id: str, video: UploadFile):
     """
     사용자 얼굴 비디오에서 embedding을 KMeans로 5개 추출 후 암호화하여 Tickity 백엔드에 저장
     """
+    video_bytes = await video.read()
+    return await run_in_threadpool(register_user_face_from_bytes, user_id, video_bytes)
+
+def register_user_face_from_bytes(user_id: str, video_bytes: bytes, progress_callback=None):
+    """
+    register_user_face_db의 동기 처리 본체 (등록 job worker에서도 그대로 사용)
+    - progress_callback(0.0~1.0): 비디오 프레임 처리 진행률
+    """
     try:
         # ✅ UUID 형식 검증
         validated_user_id = validate_uuid_or_test_id(user_id)
         # ✅ 비디오에서 embedding 추출 (5개 대표 embedding)
-        video_bytes = await video.read()
-        embeddings = extract_embedding_from_video_kmeans(video_bytes)  # KMeans 적용된 새 함수
+        embeddings, ingestion = extract_embedding_from_video_kmeans(
+            video_bytes, progress_callback=progress_callback, return_info=True
+        )  # KMeans 적용된 새 함수
         if embeddings is None or len(embeddings) == 0:
             return {"success": False, "error": "❌ 얼굴을 감지하지 못했습니다."}
+
+        # ✅ 다른 계정에 같은 얼굴이 등록되어 있는지 검사
+        duplicate_check = None
+        if DUPLICATE_CHECK_MODE in ("flag", "block"):
+            started = time.perf_counter()
+            try:
+                duplicates = find_duplicate_faces(validated_user_id, embeddings)
+            except Exception as e:
+                # gallery를 불러오지 못하면 검사 없이 통과시키지 않음 (block) / 검사 불가로 표시 (flag)
+                print(f"❌ 중복 얼굴 검사 실패: {e}")
+                if DUPLICATE_CHECK_MODE == "block":
+                    return {
+                        "success": False,
+                        "error": "중복 얼굴 검사를 할 수 없어 등록을 보류했습니다. 잠시 후 다시 시도해주세요.",
+                        "reason": "duplicate_check_unavailable",
+                    }
+                duplicates = None
+            duplicate_check = {
+                "mode": DUPLICATE_CHECK_MODE,
+                "flagged": bool(duplicates) if duplicates is not None else None,
+                "max_score": duplicates[0][1] if duplicates else None,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+            if duplicates:
+                # 다른 사용자 ID는 응답에 포함하지 않고 서버 로그에만 남김
+                print(f"⚠️ 중복 얼굴 의심: {validated_user_id} ↔ {duplicates}")
+                if DUPLICATE_CHECK_MODE == "block":
+                    return {
+                        "success": False,
+                        "error": "이미 다른 계정에 등록된 얼굴입니다.",
+                        "reason": "duplicate_face",
+                        "duplicate_check": duplicate_check,
+                    }
+
         # ✅ embedding 암호화 (5개 저장)
         encrypted_embedding = encrypt_embedding(embeddings)  # (5,512) -> bytes -> base64 str
 
@@ -77,9 +315,16 @@ async def register_user_face_db(user_id: str, video: UploadFile):
         backend_url = os.getenv("TICKITY_BACKEND_URL", "http://localhost:4000")
         full_url = f"{backend_url.rstrip('/')}/auth/face-register"
         print("[DEBUG] 실제 요청 URL:", full_url)
-        response = requests.post(full_url, files=files)
+        response = requests.post(full_url, files=files, timeout=BACKEND_REQUEST_TIMEOUT_SEC)
         try:
-            return response.json()
+            result = response.json()
+            if isinstance(result, dict):
+                result["ingestion"] = ingestion
+                if duplicate_check is not None:
+                    result["duplicate_check"] = duplicate_check
+                if result.get("success") and DUPLICATE_CHECK_MODE in ("flag", "block"):
+                    add_registered_face(validated_user_id, embeddings)
+            return result
         except Exception:
             return {"success": False, "error": f"백엔드 응답 파싱 실패: {response.text}"}
 
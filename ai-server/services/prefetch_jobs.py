@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+
+from config import REGISTRATION_JOB_DIR
+
+# 등록 job과 같은 SQLite 파일 사용 (여러 uvicorn worker가 같은 job 상태를 조회)
+DB_PATH = os.path.join(REGISTRATION_JOB_DIR, "jobs.db")
+PREFETCH_JOB_TTL_SEC = 3600      # 마지막 갱신 후 이 시간이 지난 job은 삭제 (끝났거나 처리하던 worker가 죽은 job)
+PROGRESS_FLUSH_SEC = 0.5
+
+
+def _connect():
+    os.makedirs(REGISTRATION_JOB_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_prefetch_store():
+    with closing(_connect()) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prefetch_jobs (
+                id TEXT PRIMARY KEY,
+                progress TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+
+def _save(conn, job_id, progress):
+    conn.execute(
+        "UPDATE prefetch_jobs SET progress = ?, updated_at = ? WHERE id = ?",
+        (json.dumps(progress, ensure_ascii=False), time.time(), job_id),
+    )
+
+
+class PrefetchProgress(dict):
+    """
+    prefetch_user_embeddings가 갱신하는 progress dict - 변경 내용을 job 저장소에 기록
+    (건별 갱신은 PROGRESS_FLUSH_SEC 간격으로 모아서, status 변경은 바로 기록)
+    """
+
+    def __init__(self, job_id, initial):
+        super().__init__(initial)
+        self.job_id = job_id
+        self._flushed_at = 0.0
+
+    def flush(self):
+        self._flushed_at = time.time()
+        try:
+            with closing(_connect()) as conn:
+                _save(conn, self.job_id, dict(self))
+        except sqlite3.Error as e:
+            print(f"⚠️ prefetch 진행 상황 저장 실패: {e}")
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key == "status" or time.time() - self._flushed_at >= PROGRESS_FLUSH_SEC:
+            self.flush()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.flush()
+
+
+def create_prefetch_job(total=None) -> PrefetchProgress:
+    """queued 상태의 prefetch job을 만들고 오래된 job은 정리"""
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    progress = {"status": "queued", "total": total, "worker_pid": os.getpid()}
+    with closing(_connect()) as conn:
+        conn.execute("DELETE FROM prefetch_jobs WHERE updated_at < ?", (now - PREFETCH_JOB_TTL_SEC,))
+        conn.execute(
+            "INSERT INTO prefetch_jobs (id, progress, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (job_id, json.dumps(progress), now, now),
+        )
+    return PrefetchProgress(job_id, progress)
+
+
+def get_prefetch_job(job_id: str):
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT progress, created_at, updated_at FROM prefetch_jobs WHERE id = ? AND updated_at >= ?",
+            (job_id, time.time() - PREFETCH_JOB_TTL_SEC),
+        ).fetchone()
+    if row is None:
+        return None
+    return {**json.loads(row["progress"]), "created_at": row["created_at"], "updated_at": row["updated_at"]}
@@ -0,0 +1,349 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+from config import (
+    REGISTRATION_JOB_DIR,
+    REGISTRATION_WORKERS,
+    REGISTRATION_JOB_LEASE_SEC,
+    REGISTRATION_JOB_MAX_ATTEMPTS,
+)
+
+DB_PATH = os.path.join(REGISTRATION_JOB_DIR, "jobs.db")
+POLL_INTERVAL_SEC = 1.0
+PROGRESS_UPDATE_SEC = 0.5
+
+_wakeup = threading.Event()
+
+
+def _connect():
+    os.makedirs(REGISTRATION_JOB_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_job_store():
+    """job 테이블 생성 (여러 worker 프로세스가 같은 파일을 공유하므로 WAL 모드 사용)"""
+    with closing(_connect()) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS registration_jobs (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                video_path TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_until REAL,
+                claim_token TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_registration_jobs_status ON registration_jobs(status, created_at)")
+
+        # 이전 버전에서 만든 job 파일에는 claim_token 컬럼 추가
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(registration_jobs)")}
+        if "claim_token" not in columns:
+            try:
+                conn.execute("ALTER TABLE registration_jobs ADD COLUMN claim_token TEXT")
+            except sqlite3.OperationalError:
+                pass  # 다른 worker 프로세스가 먼저 추가한 경우
+
+
+def enqueue_registration(user_id: str, video_bytes: bytes) -> str:
+    """등록 비디오를 디스크에 저장하고 job을 queued 상태로 추가"""
+    job_id = str(uuid.uuid4())
+    video_path = os.path.join(REGISTRATION_JOB_DIR, f"{job_id}.mp4")
+    os.makedirs(REGISTRATION_JOB_DIR, exist_ok=True)
+    with open(video_path, "wb") as f:
+        f.write(video_bytes)
+
+    now = time.time()
+    with closing(_connect()) as conn:
+        conn.execute(
+            "INSERT INTO registration_jobs (id, user_id, status, video_path, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, user_id, video_path, now, now),
+        )
+    _wakeup.set()
+    print(f"📥 얼굴 등록 job 추가: {job_id} (user_id={user_id})")
+    return job_id
+
+
+def get_job(job_id: str):
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM registration_jobs WHERE id = ?", (job_id,)).fetchone()
+        queued_ahead = None
+        if row is not None and row["status"] == "queued":
+            queued_ahead = conn.execute(
+                "SELECT COUNT(*) FROM registration_jobs WHERE status = 'queued' AND created_at < ?",
+                (row["created_at"],),
+            ).fetchone()[0]
+
+    if row is None:
+        return None
+
+    return {
+        "job_id": row["id"],
+        "user_id": row["user_id"],
+        "status": row["status"],
+        "progress": round(row["progress"], 3),
+        "attempts": row["attempts"],
+        "queued_ahead": queued_ahead,
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def _has_pending_job(conn) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM registration_jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) LIMIT 1",
+        (time.time(),),
+    ).fetchone()
+    return row is not None
+
+
+def _claim_job(conn, worker_id: str):
+    """
+    처리할 job 하나를 원자적으로 가져옴
+    - queued 상태이거나, running이지만 lease가 만료된(처리하던 worker가 죽은) job
+    - claim_token(worker id + 시도 횟수)을 기록해 lease를 놓친 worker가 결과를 덮어쓰지 못하게 함
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    now = time.time()
+    try:
+        row = conn.execute(
+            """
+            SELECT * FROM registration_jobs
+            WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+            ORDER BY created_at LIMIT 1
+            """,
+            (now,),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None, None
+
+        if row["attempts"] >= REGISTRATION_JOB_MAX_ATTEMPTS:
+            conn.execute(
+                "UPDATE registration_jobs SET status = 'failed', error = ?, claim_token = NULL, updated_at = ? WHERE id = ?",
+                ("최대 재시도 횟수를 초과했습니다.", now, row["id"]),
+            )
+            conn.execute("COMMIT")
+            _remove_video(row["video_path"])
+            return None, None
+
+        claim_token = f"{worker_id}#{row['attempts'] + 1}"
+        conn.execute(
+            """
+            UPDATE registration_jobs
+            SET status = 'running', attempts = attempts + 1, progress = 0, lease_until = ?, claim_token = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (now + REGISTRATION_JOB_LEASE_SEC, claim_token, now, row["id"]),
+        )
+        conn.execute("COMMIT")
+        return row, claim_token
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _renew_lease(job_id: str, claim_token: str, stop: threading.Event, lost: threading.Event):
+    """
+    job을 처리하는 동안 일정 주기로 lease 갱신 (프레임 진행률과 무관하게 KMeans / 백엔드 저장 중에도 유지)
+    - 다른 worker가 이미 가져간 job이면 lost를 set하고 종료
+    """
+    interval = max(0.2, REGISTRATION_JOB_LEASE_SEC / 3)
+    with closing(_connect()) as conn:
+        while not stop.wait(interval):
+            now = time.time()
+            try:
+                cursor = conn.execute(
+                    """
+                    UPDATE registration_jobs SET lease_until = ?, updated_at = ?
+                    WHERE id = ? AND claim_token = ? AND status = 'running'
+                    """,
+                    (now + REGISTRATION_JOB_LEASE_SEC, now, job_id, claim_token),
+                )
+            except sqlite3.Error as e:
+                print(f"⚠️ 등록 job {job_id} lease 갱신 실패 (다음 주기에 재시도): {e}")
+                continue
+            if cursor.rowcount == 0:
+                lost.set()
+                print(f"⚠️ 등록 job {job_id}의 lease를 잃었습니다 ({claim_token})")
+                return
+
+
+def _remove_video(video_path):
+    try:
+        os.remove(video_path)
+    except OSError:
+        pass
+
+
+def _process_job(conn, row, claim_token: str):
+    # 모델을 불러오는 face_service는 실제 처리 시점에 import (job 저장소 조회만 하는 프로세스는 모델 불필요)
+    from services.face_service import register_user_face_from_bytes
+
+    job_id = row["id"]
+    last_update = [0.0]
+
+    def on_progress(progress):
+        now = time.time()
+        if now - last_update[0] < PROGRESS_UPDATE_SEC:
+            return
+        last_update[0] = now
+        conn.execute(
+            "UPDATE registration_jobs SET progress = ?, updated_at = ? WHERE id = ? AND claim_token = ?",
+            (progress, now, job_id, claim_token),
+        )
+
+    stop_heartbeat, lease_lost = threading.Event(), threading.Event()
+    heartbeat = threading.Thread(
+        target=_renew_lease, args=(job_id, claim_token, stop_heartbeat, lease_lost),
+        name=f"registration-lease-{job_id[:8]}", daemon=True,
+    )
+    heartbeat.start()
+
+    print(f"⚙️ 얼굴 등록 job 처리 시작: {job_id} (시도 {row['attempts'] + 1}회차)")
+    try:
+        with open(row["video_path"], "rb") as f:
+            video_bytes = f.read()
+        result = register_user_face_from_bytes(row["user_id"], video_bytes, progress_callback=on_progress)
+        status = "done" if result.get("success") else "failed"
+        error = None if status == "done" else result.get("error")
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+        status, error = "failed", str(e)
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+
+    # 이 worker의 claim이 유효할 때만 결과 저장 / 비디오 삭제 (다른 worker가 재처리 중이면 건드리지 않음)
+    cursor = conn.execute(
+        """
+        UPDATE registration_jobs
+        SET status = ?, progress = 1, result = ?, error = ?, lease_until = NULL, updated_at = ?
+        WHERE id = ? AND claim_token = ?
+        """,
+        (status, json.dumps(result, ensure_ascii=False), error, time.time(), job_id, claim_token),
+    )
+    if cursor.rowcount == 0 or lease_lost.is_set():
+        print(f"⚠️ 얼굴 등록 job {job_id}: 다른 worker가 처리 중이므로 결과를 저장하지 않습니다 ({claim_token})")
+        return
+
+    _remove_video(row["video_path"])
+    print(f"{'✅' if status == 'done' else '❌'} 얼굴 등록 job {job_id} {status}")
+
+
+class RegistrationWorkerPool:
+    """
+    얼굴 등록 job을 처리하는 worker 스레드 묶음
+    - 동시 처리 수는 worker 수로 제한됩니다.
+    - API 프로세스 안에서 실행할 때는 admission controller의 register 슬롯을 받은 뒤 처리하므로
+      verify / identify 요청보다 우선되지 않습니다 (start(admission, loop)).
+    - API 서버와 분리해서 `python -m services.registration_jobs`로 별도 프로세스 실행 가능
+    """
+
+    def __init__(self, num_workers: int = REGISTRATION_WORKERS):
+        self.num_workers = num_workers
+        self.threads = []
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.admission = None
+        self.loop = None
+        self._stop = threading.Event()
+
+    def start(self, admission=None, loop=None):
+        init_job_store()
+        self.admission, self.loop = admission, loop
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._run, name=f"registration-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"✅ 얼굴 등록 worker {self.num_workers}개 시작")
+
+    def stop(self):
+        self._stop.set()
+        _wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+    def _acquire_slot(self):
+        """
+        event loop의 admission controller에서 register 슬롯을 받고, 반납 함수를 반환
+        (대기열이 가득 찼거나 max_wait을 넘기면 예외 → 잠시 후 다시 시도)
+        """
+        if self.admission is None:
+            return lambda: None
+
+        asyncio.run_coroutine_threadsafe(self.admission.acquire("register"), self.loop).result()
+        started_at = time.monotonic()
+
+        def release():
+            try:
+                self.loop.call_soon_threadsafe(
+                    self.admission.release, "register", (time.monotonic() - started_at) * 1000
+                )
+            except RuntimeError:
+                pass  # 서버 종료로 event loop가 이미 닫힌 경우
+
+        return release
+
+    def _wait(self):
+        _wakeup.wait(POLL_INTERVAL_SEC)
+        _wakeup.clear()
+
+    def _run(self):
+        conn = _connect()
+        worker_id = f"{self.worker_id}:{threading.current_thread().name}"
+        while not self._stop.is_set():
+            try:
+                # 처리할 job이 있을 때만 슬롯을 요청 (빈 큐를 polling하는 동안 슬롯을 잡고 있지 않도록)
+                if self.admission is not None and not _has_pending_job(conn):
+                    self._wait()
+                    continue
+                release = self._acquire_slot()
+            except Exception as e:
+                print(f"⚠️ 등록 worker 실행 슬롯 대기 실패: {getattr(e, 'detail', e)}")
+                self._wait()
+                continue
+
+            try:
+                row, claim_token = _claim_job(conn, worker_id)
+            except Exception as e:
+                print(f"❌ 등록 job 조회 실패: {e}")
+                row = None
+
+            try:
+                if row is not None:
+                    _process_job(conn, row, claim_token)
+            finally:
+                release()
+
+            if row is None:
+                self._wait()
+        conn.close()
+
+
+if __name__ == "__main__":
+    pool = RegistrationWorkerPool(max(1, REGISTRATION_WORKERS))
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
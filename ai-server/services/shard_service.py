@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import heapq
+import threading
+import time
+
+import httpx
+
+from config import supabase, SHARD_INDEX, SHARD_COUNT, SHARD_URLS, SHARD_TIMEOUT_SEC, SHARD_REFRESH_SEC
+from services.face_service import fetch_all_rows, prefetch_user_embeddings
+from utils.similarity import GalleryIndex
+
+shard_gallery = GalleryIndex()
+shard_versions = {}  # user_id → face_embeddings.created_at (백엔드가 재등록 시에도 갱신)
+shard_state = {"status": "empty", "reloading": False, "loaded_at": None, "refreshed_at": None, "load": {}, "refresh": {}}
+_load_lock = threading.Lock()
+
+
+def shard_of(user_id: str, shard_count: int = SHARD_COUNT) -> int:
+    """user_id가 속한 샤드 번호 (모든 노드에서 같은 값이 나오도록 고정 해시 사용)"""
+    digest = hashlib.blake2b(user_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shard_count
+
+
+def list_owned_users():
+    """
+    이 노드가 담당하는 사용자의 {user_id: created_at} (embedding 없이 페이지 단위로 전체 조회)
+    """
+    rows = fetch_all_rows(lambda: supabase.table("face_embeddings").select("user_id, created_at").order("id"))
+    return {r["user_id"]: r.get("created_at") for r in rows if shard_of(r["user_id"]) == SHARD_INDEX}
+
+
+def load_shard_gallery():
+    """
+    이 노드가 담당하는 사용자(shard_of(user_id) == SHARD_INDEX)의 embedding만 batch로 조회해 gallery 구성
+    (user_id 목록만 먼저 받고, 복호화는 자기 몫만 수행)
+    """
+    if SHARD_INDEX is None:
+        raise ValueError("SHARD_INDEX가 설정되지 않은 노드입니다.")
+
+    with _load_lock:
+        # 이미 ready인 노드의 재적재 중에는 기존 gallery로 계속 검색 응답
+        was_ready = shard_state["status"] == "ready"
+        shard_state.update({"status": "ready" if was_ready else "loading", "reloading": True})
+        try:
+            owned = list_owned_users()
+
+            embeddings = {}
+            progress = {}
+            prefetch_user_embeddings(list(owned), embeddings, progress)
+            if progress.get("status") != "done":
+                # batch 조회가 실패하면 일부만 담긴 gallery로 ready가 되지 않도록 실패 처리
+                raise RuntimeError(f"embedding 조회 실패: {progress.get('error')}")
+
+            # 새 gallery를 다 만든 뒤 교체하여 로드 중에도 기존 gallery로 검색 가능
+            global shard_gallery, shard_versions
+            shard_gallery = GalleryIndex(embeddings)
+            shard_versions = {user_id: owned[user_id] for user_id in embeddings}
+            shard_state.update({"status": "ready", "reloading": False, "loaded_at": time.time(), "load": progress, "error": None})
+            print(f"✅ 샤드 {SHARD_INDEX}/{SHARD_COUNT}: {len(shard_gallery)}명 gallery 적재 완료")
+        except Exception as e:
+            shard_state.update({"status": "ready" if was_ready else "failed", "reloading": False, "error": str(e)})
+            print(f"❌ 샤드 gallery 적재 실패{' (기존 gallery 유지)' if was_ready else ''}: {e}")
+            raise
+
+
+def refresh_shard_gallery():
+    """
+    전체를 다시 적재하지 않고 변경분만 반영
+    - created_at이 바뀐(새로 등록 / 재등록) 사용자만 embedding을 조회해 add, DB에서 사라진 사용자는 remove
+    """
+    with _load_lock:
+        owned = list_owned_users()
+        changed = [u for u, version in owned.items() if u not in shard_versions or shard_versions[u] != version]
+        removed = [u for u in shard_versions if u not in owned]
+
+        embeddings = {}
+        progress = {}
+        if changed:
+            prefetch_user_embeddings(changed, embeddings, progress)
+        for user_id, embedding in embeddings.items():
+            shard_gallery.add(user_id, embedding)
+            shard_versions[user_id] = owned[user_id]
+        for user_id in removed:
+            shard_gallery.remove(user_id)
+            del shard_versions[user_id]
+
+        shard_state.update({
+            "refreshed_at": time.time(),
+            "refresh": {"updated": len(embeddings), "removed": len(removed), "failed": len(changed) - len(embeddings)},
+        })
+        if embeddings or removed:
+            print(f"🔄 샤드 {SHARD_INDEX}/{SHARD_COUNT} gallery 갱신: +{len(embeddings)} / -{len(removed)} (총 {len(shard_gallery)}명)")
+
+
+def run_shard_gallery_sync(stop_event: threading.Event = None, interval: float = SHARD_REFRESH_SEC):
+    """
+    샤드 노드 백그라운드 작업: 시작 시 전체 적재 후 interval초마다 변경분 반영
+    (interval이 0이면 시작 시 적재만 하고, 이후에는 /shard/reload로만 다시 적재)
+    """
+    stop_event = stop_event or threading.Event()
+    try:
+        load_shard_gallery()
+    except Exception:
+        pass  # load_shard_gallery에서 이미 기록, 다음 주기에 다시 시도
+
+    if interval <= 0:
+        return
+    while not stop_event.wait(interval):
+        try:
+            if shard_state["status"] == "ready":
+                refresh_shard_gallery()
+            else:
+                load_shard_gallery()
+        except Exception as e:
+            print(f"⚠️ 샤드 gallery 갱신 실패 (다음 주기에 재시도): {e}")
+
+
+def is_ready() -> bool:
+    """검색에 응답해도 되는 상태인지 (gallery 적재가 끝난 샤드 노드)"""
+    return SHARD_INDEX is not None and shard_state["status"] == "ready"
+
+
+def search_local(embedding, k: int):
+    return [{"user_id": user_id, "score": score} for user_id, score in shard_gallery.search(embedding, k)]
+
+
+async def scatter_gather_search(embedding, k: int, shard_urls=SHARD_URLS, timeout: float = SHARD_TIMEOUT_SEC):
+    """
+    모든 샤드에 동시에 top-k 검색을 요청하고 deadline 안에 도착한 결과만 병합
+    - 느리거나 죽은 샤드는 결과에서 빠지고 timed_out / failed로 보고됩니다.
+    """
+    payload = {"embedding": [float(x) for x in embedding], "k": k}
+    report = {"requested": len(shard_urls), "responded": [], "failed": [], "timed_out": []}
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        tasks = {
+            asyncio.create_task(client.post(f"{url}/shard/search", json=payload)): url
+            for url in shard_urls
+        }
+        done, pending = await asyncio.wait(tasks.keys(), timeout=timeout)
+        for task in pending:
+            task.cancel()
+            report["timed_out"].append(tasks[task])
+
+        candidates = []
+        for task in done:
+            url = tasks[task]
+            try:
+                response = task.result()
+                response.raise_for_status()
+                candidates.extend(response.json()["matches"])
+                report["responded"].append(url)
+            except Exception as e:
+                print(f"⚠️ 샤드 검색 실패 ({url}): {e}")
+                report["failed"].append(url)
+
+    merged = heapq.nlargest(k, candidates, key=lambda m: m["score"])
+    return merged, report
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# ai-server 디렉터리의 모듈(config, services, utils)을 그대로 import
+AI_SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AI_SERVER_DIR)
+
+# config import 시 Supabase client를 만들므로 로컬 기본값 지정 (실제 요청은 보내지 않음)
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "aaa.bbb.ccc")
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from utils.admission import AdmissionController
+
+
+def _controller(capacity=1, max_queue=1, max_wait=0.2):
+    return AdmissionController(capacity, {
+        "verify": {"priority": 0, "limit": capacity, "max_queue": max_queue, "max_wait": max_wait},
+        "register": {"priority": 1, "limit": capacity, "max_queue": max_queue, "max_wait": max_wait},
+    })
+
+
+async def _hold(admission, name, release: asyncio.Event):
+    async with admission.slot(name):
+        await release.wait()
+
+
+def test_queue_full_returns_503_with_retry_after():
+    async def scenario():
+        admission = _controller(max_queue=1, max_wait=5)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(admission, "verify", release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(_hold(admission, "verify", release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as exc:
+            await admission.acquire("verify")
+
+        release.set()
+        await asyncio.gather(running, waiting)
+        return admission, exc.value
+
+    admission, error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert int(error.headers["Retry-After"]) >= 1
+    stats = admission.stats()
+    assert stats["classes"]["verify"]["rejected_queue_full"] == 1
+    assert stats["classes"]["verify"]["admitted"] == 2
+    assert stats["running"] == 0
+
+
+def test_wait_timeout_returns_503_and_leaves_queue():
+    async def scenario():
+        admission = _controller(max_wait=0.05)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(admission, "verify", release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as exc:
+            await admission.acquire("verify")
+        queued = len(admission.queues["verify"])
+
+        release.set()
+        await running
+        return admission, exc.value, queued
+
+    admission, error, queued = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert "Retry-After" in error.headers
+    assert queued == 0
+    assert admission.stats_by_class["verify"]["rejected_timeout"] == 1
+    assert admission.running == 0
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def scenario():
+        admission = _controller(max_wait=5)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(admission, "verify", release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(_hold(admission, "verify", release))
+        await asyncio.sleep(0)
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert len(admission.queues["verify"]) == 0
+
+        release.set()
+        await running
+        # 취소된 요청이 슬롯을 차지하지 않으므로 바로 다음 요청 실행
+        await asyncio.wait_for(admission.acquire("verify"), timeout=1)
+        admission.release("verify", 0.0)
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.running == 0
+    assert admission.stats_by_class["verify"]["running"] == 0
+
+
+def test_cancel_after_slot_granted_releases_it():
+    async def scenario():
+        admission = _controller(max_wait=5)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(admission, "verify", release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(admission.acquire("verify"))
+        await asyncio.sleep(0)
+
+        # 슬롯이 대기 요청에 배정된 직후(깨어나기 전) 취소
+        release.set()
+        await running
+        assert admission.running == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.running == 0
+    assert admission.stats_by_class["verify"]["running"] == 0
+
+
+def test_higher_priority_waiter_runs_first():
+    async def scenario():
+        admission = _controller(max_wait=5)
+        release = asyncio.Event()
+        order = []
+
+        async def record(name):
+            async with admission.slot(name):
+                order.append(name)
+
+        running = asyncio.create_task(_hold(admission, "register", release))
+        await asyncio.sleep(0)
+        low = asyncio.create_task(record("register"))
+        await asyncio.sleep(0)
+        high = asyncio.create_task(record("verify"))
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(running, low, high)
+        return order
+
+    assert asyncio.run(scenario()) == ["verify", "register"]
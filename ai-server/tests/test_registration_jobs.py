@@ -0,0 +1,124 @@
+import os
+import sys
+import types
+from contextlib import closing
+
+import pytest
+
+from services import registration_jobs as jobs
+
+
+@pytest.fixture
+def job_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "REGISTRATION_JOB_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs, "DB_PATH", str(tmp_path / "jobs.db"))
+    jobs.init_job_store()
+    return tmp_path
+
+
+@pytest.fixture
+def fake_register(monkeypatch):
+    """insightface 없이 실행되도록 등록 함수를 대체하고 호출 기록"""
+    calls = []
+
+    def register_user_face_from_bytes(user_id, video_bytes, progress_callback=None):
+        calls.append((user_id, video_bytes))
+        progress_callback(0.5)
+        return {"success": True, "user_id": user_id}
+
+    fake = types.ModuleType("services.face_service")
+    fake.register_user_face_from_bytes = register_user_face_from_bytes
+    monkeypatch.setitem(sys.modules, "services.face_service", fake)
+    return calls
+
+
+def _row(job_id):
+    with closing(jobs._connect()) as conn:
+        return conn.execute("SELECT * FROM registration_jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def _expire_lease(job_id):
+    with closing(jobs._connect()) as conn:
+        conn.execute("UPDATE registration_jobs SET lease_until = 0 WHERE id = ?", (job_id,))
+
+
+def test_claim_marks_job_running(job_store):
+    job_id = jobs.enqueue_registration("user-1", b"video")
+
+    with closing(jobs._connect()) as conn:
+        row, token = jobs._claim_job(conn, "worker-a")
+        assert jobs._claim_job(conn, "worker-b") == (None, None)  # lease가 살아 있으면 다른 worker는 못 가져감
+
+    assert row["id"] == job_id and token == "worker-a#1"
+    job = jobs.get_job(job_id)
+    assert job["status"] == "running" and job["attempts"] == 1
+
+
+def test_expired_lease_is_reclaimed(job_store):
+    job_id = jobs.enqueue_registration("user-1", b"video")
+
+    with closing(jobs._connect()) as conn:
+        _, token_a = jobs._claim_job(conn, "worker-a")
+        _expire_lease(job_id)
+        assert jobs._has_pending_job(conn)
+        row, token_b = jobs._claim_job(conn, "worker-b")
+
+    assert (token_a, token_b) == ("worker-a#1", "worker-b#2")
+    assert row["id"] == job_id
+    stored = _row(job_id)
+    assert stored["claim_token"] == "worker-b#2" and stored["attempts"] == 2
+    assert stored["lease_until"] > 0
+
+
+def test_stale_worker_completion_is_rejected(job_store, fake_register):
+    job_id = jobs.enqueue_registration("user-1", b"video")
+
+    with closing(jobs._connect()) as conn:
+        row_a, token_a = jobs._claim_job(conn, "worker-a")
+        _expire_lease(job_id)
+        row_b, token_b = jobs._claim_job(conn, "worker-b")
+
+        # lease를 잃은 worker-a가 뒤늦게 끝나도 결과를 덮어쓰거나 비디오를 지우지 않음
+        jobs._process_job(conn, row_a, token_a)
+        stored = _row(job_id)
+        assert stored["status"] == "running"
+        assert stored["claim_token"] == token_b
+        assert stored["result"] is None
+        assert os.path.exists(row_a["video_path"])
+
+        jobs._process_job(conn, row_b, token_b)
+
+    job = jobs.get_job(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"success": True, "user_id": "user-1"}
+    assert not os.path.exists(row_b["video_path"])
+    assert fake_register == [("user-1", b"video"), ("user-1", b"video")]
+
+
+def test_failed_registration_is_recorded(job_store, fake_register):
+    job_id = jobs.enqueue_registration("user-1", b"video")
+    sys.modules["services.face_service"].register_user_face_from_bytes = (
+        lambda user_id, video_bytes, progress_callback=None: {"success": False, "error": "얼굴 없음"}
+    )
+
+    with closing(jobs._connect()) as conn:
+        row, token = jobs._claim_job(conn, "worker-a")
+        jobs._process_job(conn, row, token)
+
+    job = jobs.get_job(job_id)
+    assert job["status"] == "failed" and job["error"] == "얼굴 없음"
+
+
+def test_job_fails_after_max_attempts(job_store, monkeypatch):
+    monkeypatch.setattr(jobs, "REGISTRATION_JOB_MAX_ATTEMPTS", 2)
+    job_id = jobs.enqueue_registration("user-1", b"video")
+
+    with closing(jobs._connect()) as conn:
+        for worker in ("worker-a", "worker-b"):
+            assert jobs._claim_job(conn, worker)[1] is not None
+            _expire_lease(job_id)
+        assert jobs._claim_job(conn, "worker-c") == (None, None)
+
+    job = jobs.get_job(job_id)
+    assert job["status"] == "failed" and job["attempts"] == 2
+    assert not os.path.exists(_row(job_id)["video_path"])
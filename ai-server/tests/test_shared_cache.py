@@ -0,0 +1,153 @@
+import os
+import subprocess
+import sys
+import textwrap
+import uuid
+
+import numpy as np
+import pytest
+
+from utils.shared_cache import ID_BYTES, SharedEmbeddingStore, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="공유 embedding 캐시는 fcntl이 필요")
+
+DIM = 8
+AI_SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _templates(seed, n=2):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def store_name():
+    name = f"tickity_test_{uuid.uuid4().hex[:12]}"
+    yield name
+    for suffix in (".lock", ".ref"):
+        try:
+            os.remove(os.path.join("/tmp", name + suffix))
+        except OSError:
+            pass
+
+
+@pytest.fixture
+def store(store_name):
+    store = SharedEmbeddingStore(store_name, n_slots=4, max_templates=3, dim=DIM)
+    yield store
+    store.close()
+
+
+def test_insert_and_lookup(store):
+    store["user-a"] = _templates(1)
+    store["user-b"] = _templates(2, n=3)
+
+    assert len(store) == 2
+    assert "user-a" in store and "user-c" not in store
+    np.testing.assert_array_equal(store["user-a"], _templates(1))
+    np.testing.assert_array_equal(store.get("user-b"), _templates(2, n=3))
+    assert store.get("user-c", "missing") == "missing"
+    with pytest.raises(KeyError):
+        store["user-c"]
+
+
+def test_overwrite_keeps_single_entry(store):
+    store["user-a"] = _templates(1)
+    store["user-a"] = _templates(3, n=1)
+
+    assert len(store) == 1
+    # template이 1개면 decrypt_embedding과 같은 (dim,) shape으로 반환
+    np.testing.assert_array_equal(store["user-a"], _templates(3, n=1)[0])
+
+
+def test_eviction_and_relookup(store):
+    for i in range(4):
+        store[f"user-{i}"] = _templates(i)
+
+    # 모든 슬롯의 참조 비트가 1 → 한 바퀴 돌며 비트를 지운 뒤 가장 먼저 만난 user-0 교체
+    store["user-4"] = _templates(4)
+    assert store.evictions == 1
+    assert "user-0" not in store
+    assert len(store) == 4
+
+    # 최근 조회한 user-2는 second chance로 남고 user-1, user-3이 교체됨
+    store["user-2"]
+    store["user-5"] = _templates(5)
+    store["user-6"] = _templates(6)
+    assert store.evictions == 3
+    assert {u for u in (f"user-{i}" for i in range(7)) if u in store} == {"user-2", "user-4", "user-5", "user-6"}
+
+    # 교체된 사용자를 다시 넣으면 정상 조회
+    store["user-0"] = _templates(10)
+    np.testing.assert_array_equal(store["user-0"], _templates(10))
+    np.testing.assert_array_equal(store["user-2"], _templates(2))
+    assert store.evictions == 4
+    assert len(store) == 4
+
+
+def test_many_evictions_keep_index_consistent(store):
+    for i in range(50):
+        store[f"user-{i}"] = _templates(i)
+        np.testing.assert_array_equal(store[f"user-{i}"], _templates(i))
+
+    assert len(store) == 4
+    assert store.evictions == 46
+    assert sum(f"user-{i}" in store for i in range(50)) == 4
+
+
+def test_overlong_keys(store):
+    key = "x" * (ID_BYTES + 1)
+
+    assert store.get(key) is None
+    assert store.get(key, "missing") == "missing"
+    assert key not in store
+    with pytest.raises(ValueError):
+        store[key] = _templates(1)
+
+
+def test_rejects_too_many_templates(store):
+    with pytest.raises(ValueError):
+        store["user-a"] = _templates(1, n=4)
+
+
+def _run_child(name, code):
+    script = textwrap.dedent(f"""
+        import numpy as np
+        from utils.shared_cache import SharedEmbeddingStore
+        store = SharedEmbeddingStore({name!r}, n_slots=4, max_templates=3, dim={DIM})
+    """) + textwrap.dedent(code)
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=AI_SERVER_DIR, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_second_process_attaches(store, store_name):
+    store["user-a"] = _templates(1)
+
+    out = _run_child(store_name, f"""
+        print("LOOKUP", store["user-a"].tobytes().hex())
+        store["user-b"] = np.full((1, {DIM}), 7, dtype=np.float32)
+        store.close()
+    """)
+
+    assert "공유 embedding 캐시 연결" in out
+    assert bytes.fromhex(out.split("LOOKUP ")[1].split()[0]) == _templates(1).tobytes()
+    # 자식이 먼저 닫아도 세그먼트는 부모가 참조 중이므로 유지
+    np.testing.assert_array_equal(store["user-b"], np.full(DIM, 7, dtype=np.float32))
+    assert len(store) == 2
+
+
+def test_last_close_unlinks(store_name):
+    store = SharedEmbeddingStore(store_name, n_slots=4, max_templates=3, dim=DIM)
+    store["user-a"] = _templates(1)
+    store.close()
+    store.close()  # 여러 번 호출해도 안전
+
+    # 참조하는 프로세스가 없으면 새 세그먼트가 만들어지므로 이전 데이터는 남지 않음
+    out = _run_child(store_name, """
+        print("LEN", len(store))
+        store.close()
+    """)
+    assert "공유 embedding 캐시 생성" in out
+    assert "LEN 0" in out
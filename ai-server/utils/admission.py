@@ -0,0 +1,157 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+
+class AdmissionController:
+    """
+    AI 엔드포인트 동시 실행 수 제한 + 요청 종류별 우선순위 스케줄링
+    - 요청 종류(verify / identify / register)마다 별도의 bounded queue를 둡니다.
+    - 실행 슬롯이 비면 priority가 낮은(=우선순위가 높은) 종류의 대기 요청부터 실행합니다.
+    - 대기열이 가득 찼거나 max_wait 안에 슬롯을 얻지 못하면 503 + Retry-After로 거절합니다.
+    """
+
+    def __init__(self, capacity: int, classes: dict):
+        self.capacity = capacity
+        self.classes = classes
+        self.order = sorted(classes, key=lambda name: classes[name]["priority"])
+        self.running = 0
+        self.queues = {name: deque() for name in classes}
+        self.stats_by_class = {
+            name: {
+                "running": 0,
+                "admitted": 0,
+                "rejected_queue_full": 0,
+                "rejected_timeout": 0,
+                "avg_wait_ms": 0.0,
+                "avg_service_ms": 0.0,
+            }
+            for name in classes
+        }
+
+    def _can_run(self, name: str) -> bool:
+        return self.running < self.capacity and self.stats_by_class[name]["running"] < self.classes[name]["limit"]
+
+    def _start(self, name: str):
+        self.running += 1
+        self.stats_by_class[name]["running"] += 1
+
+    def _dispatch(self):
+        """빈 슬롯을 우선순위 순서대로 대기 중인 요청에 배정"""
+        for name in self.order:
+            queue = self.queues[name]
+            while queue and self._can_run(name):
+                future = queue.popleft()
+                if future.done():
+                    continue
+                self._start(name)
+                future.set_result(True)
+
+    def _withdraw(self, name: str, future):
+        future.cancel()
+        try:
+            self.queues[name].remove(future)
+        except ValueError:
+            pass
+
+    def _retry_after(self, name: str) -> int:
+        """평균 처리 시간과 대기열 길이로 재시도 시점(초) 추정"""
+        stats = self.stats_by_class[name]
+        service_sec = max(stats["avg_service_ms"] / 1000, 0.1)
+        limit = max(1, min(self.capacity, self.classes[name]["limit"]))
+        return max(1, math.ceil(service_sec * (len(self.queues[name]) + 1) / limit))
+
+    def _reject(self, name: str, reason: str):
+        self.stats_by_class[name][reason] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="서버가 혼잡합니다. 잠시 후 다시 시도해주세요.",
+            headers={"Retry-After": str(self._retry_after(name))},
+        )
+
+    @staticmethod
+    def _ewma(old: float, new: float, alpha: float = 0.2) -> float:
+        return new if old == 0.0 else (1 - alpha) * old + alpha * new
+
+    async def acquire(self, name: str):
+        config = self.classes[name]
+        stats = self.stats_by_class[name]
+        queue = self.queues[name]
+        enqueued_at = time.monotonic()
+
+        # 같은 종류 또는 더 높은 우선순위의 대기 요청이 없을 때만 바로 실행
+        higher_waiting = any(
+            self.queues[other] for other in self.order[:self.order.index(name) + 1]
+        )
+        if not higher_waiting and self._can_run(name):
+            self._start(name)
+        else:
+            if len(queue) >= config["max_queue"]:
+                self._reject(name, "rejected_queue_full")
+
+            future = asyncio.get_running_loop().create_future()
+            queue.append(future)
+            try:
+                await asyncio.wait({future}, timeout=config["max_wait"])
+            except BaseException:
+                # 요청이 취소된 경우: 이미 슬롯을 받았다면 반납, 아니면 대기열에서 제거
+                if future.done():
+                    self.release(name, 0.0)
+                else:
+                    self._withdraw(name, future)
+                raise
+
+            if not future.done():
+                self._withdraw(name, future)
+                self._reject(name, "rejected_timeout")
+
+        stats["admitted"] += 1
+        stats["avg_wait_ms"] = self._ewma(stats["avg_wait_ms"], (time.monotonic() - enqueued_at) * 1000)
+
+    def release(self, name: str, service_ms: float):
+        stats = self.stats_by_class[name]
+        self.running -= 1
+        stats["running"] -= 1
+        stats["avg_service_ms"] = self._ewma(stats["avg_service_ms"], service_ms)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, name: str):
+        """
+        사용 예:
+            async with admission.slot("verify"):
+                embedding = await run_in_threadpool(extract_embedding_from_image, frame_bytes)
+        """
+        await self.acquire(name)
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(name, (time.monotonic() - started_at) * 1000)
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "running": self.running,
+            "classes": {
+                name: {
+                    **self.stats_by_class[name],
+                    "priority": self.classes[name]["priority"],
+                    "limit": self.classes[name]["limit"],
+                    "queued": len(self.queues[name]),
+                    "max_queue": self.classes[name]["max_queue"],
+                    "max_wait_sec": self.classes[name]["max_wait"],
+                }
+                for name in self.order
+            },
+        }
+
+
+def create_admission_controller():
+    from config import AI_MAX_CONCURRENCY, ADMISSION_CLASSES
+
+    return AdmissionController(AI_MAX_CONCURRENCY, ADMISSION_CLASSES)
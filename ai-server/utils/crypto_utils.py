@@ -24,17 +24,19 @@ def encrypt_embedding(embeddings: np.ndarray) -> str:
     encrypted = fernet.encrypt(combined)
     return base64.b64encode(encrypted).decode()
 
-def decrypt_embedding(encrypted_b64: str) -> np.ndarray:
+def decrypt_embedding(encrypted_b64: str, verbose: bool = True) -> np.ndarray:
     encrypted = base64.b64decode(encrypted_b64.encode())
     decrypted = fernet.decrypt(encrypted)
 
     shape = np.frombuffer(decrypted[:8], dtype=np.int32)
-    print(f"🔍 복호화된 shape 정보: {shape}")
+    if verbose:
+        print(f"🔍 복호화된 shape 정보: {shape}")
 
     data = decrypted[8:]
     embeddings = np.frombuffer(data, dtype=np.float32)
 
-    print(f"🔍 복호화된 embedding 길이: {len(embeddings)}")
+    if verbose:
+        print(f"🔍 복호화된 embedding 길이: {len(embeddings)}")
 
     try:
         embeddings = embeddings.reshape(shape)
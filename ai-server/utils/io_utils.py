@@ -5,6 +5,7 @@ from insightface.app import FaceAnalysis
 from sklearn.cluster import KMeans
 from sklearn.metrics import silhouette_score
 import io
+import tempfile
 
 # InsightFace 모델 로드 (전역 변수로 한 번만 로드)
 try:
@@ -45,19 +46,225 @@ def apply_clahe(image, clip_limit=2.0, tile_grid_size=(8, 8)):
     return enhanced_image
 
 
-def extract_embedding_from_image(image_bytes):
+# 품질 검사용 얼굴 검출기 (Haar cascade, 축소 이미지에서 얼굴 크기만 대략 추정)
+try:
+    face_cascade = cv2.CascadeClassifier(
+        os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+    )
+    if face_cascade.empty():
+        face_cascade = None
+except Exception as e:
+    print(f"⚠️ Haar cascade 로드 실패, 얼굴 크기 사전 검사 생략: {e}")
+    face_cascade = None
+
+QUALITY_MESSAGES = {
+    "decode_failed": "이미지를 읽을 수 없습니다. 다시 시도해주세요.",
+    "too_dark": "조명이 너무 어둡습니다. 더 밝은 곳에서 시도해주세요.",
+    "too_bright": "빛이 너무 강합니다. 역광이나 직사광을 피해주세요.",
+    "blurry": "화면이 흐립니다. 카메라를 고정하고 잠시 멈춰주세요.",
+    "face_too_small": "얼굴이 너무 작습니다. 카메라에 더 가까이 와주세요.",
+}
+
+def assess_frame_quality(gray, check_face_size=True):
     """
-    단일 이미지에서 얼굴 임베딩을 추출 (det_score 필터링, gamma correction 추가)
+    축소된 grayscale 이미지로 blur / 노출 / 얼굴 크기를 빠르게 검사
+    - 모델(app.get)을 호출해도 인증이 불가능한 프레임을 미리 걸러냅니다.
+    - reason은 프론트엔드에서 안내 문구를 고르는 데 쓰는 고정 코드입니다.
+    """
+    from config import (
+        QUALITY_MIN_BLUR_VAR,
+        QUALITY_MIN_BRIGHTNESS,
+        QUALITY_MAX_BRIGHTNESS,
+        QUALITY_MAX_CLIPPED_RATIO,
+        QUALITY_MIN_FACE_RATIO,
+    )
+
+    hist = np.bincount(gray.ravel(), minlength=256)
+    total = gray.size
+    mean_brightness = float(np.dot(hist, np.arange(256)) / total)
+    clipped_ratio = float(hist[250:].sum() / total)
+    blur_var = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    metrics = {
+        "blur_var": round(blur_var, 2),
+        "mean_brightness": round(mean_brightness, 2),
+        "clipped_ratio": round(clipped_ratio, 4),
+        "face_ratio": None,
+    }
+
+    reason = None
+    if mean_brightness < QUALITY_MIN_BRIGHTNESS:
+        reason = "too_dark"
+    elif mean_brightness > QUALITY_MAX_BRIGHTNESS or clipped_ratio > QUALITY_MAX_CLIPPED_RATIO:
+        reason = "too_bright"
+    elif blur_var < QUALITY_MIN_BLUR_VAR:
+        reason = "blurry"
+    elif check_face_size and face_cascade is not None:
+        h, w = gray.shape[:2]
+        rects = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=4, minSize=(20, 20))
+        # Haar가 얼굴을 못 찾은 경우는 거부하지 않고 본 검출기에 맡깁니다.
+        if len(rects) > 0:
+            face_ratio = float(max(r[2] for r in rects) / w)
+            metrics["face_ratio"] = round(face_ratio, 4)
+            if face_ratio < QUALITY_MIN_FACE_RATIO:
+                reason = "face_too_small"
+
+    return {
+        "ok": reason is None,
+        "reason": reason,
+        "message": QUALITY_MESSAGES.get(reason),
+        "metrics": metrics,
+    }
+
+MIN_IMAGE_BYTES = 32  # 이보다 짧으면 어떤 이미지 형식의 헤더도 될 수 없음
+
+def decode_image(image_bytes, flags):
+    """
+    이미지 바이트 디코딩 (빈 업로드 / 잘린 데이터는 cv2.error 대신 None 반환)
+    """
+    if not image_bytes or len(image_bytes) < MIN_IMAGE_BYTES:
+        return None
+    try:
+        return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flags)
+    except cv2.error:
+        return None
+
+def check_frame_quality(image_bytes, max_width=320):
+    """
+    이미지 바이트를 축소 grayscale로만 디코딩하여 품질 사전 검사 수행
+    (JPEG는 DCT 단계에서 축소된 크기로 디코딩되므로 전체 컬러 디코딩보다 훨씬 빠름)
+    """
+    # 헤더 크기를 알면 max_width 이상을 유지하는 가장 큰 축소 배율로 디코딩
+    scale = 2
+    size = read_image_size(image_bytes)
+    if size:
+        scale = next((s for s in (8, 4, 2, 1) if size[0] / s >= max_width), 1)
+
+    gray = decode_image(image_bytes, REDUCED_GRAY_FLAGS[scale])
+    if gray is None:
+        return {
+            "ok": False,
+            "reason": "decode_failed",
+            "message": QUALITY_MESSAGES["decode_failed"],
+            "metrics": {},
+        }
+
+    h, w = gray.shape[:2]
+    if w > max_width:
+        gray = cv2.resize(gray, (max_width, int(h * max_width / w)), interpolation=cv2.INTER_AREA)
+
+    return assess_frame_quality(gray)
+
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+REDUCED_COLOR_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+REDUCED_GRAY_FLAGS = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+def read_image_size(image_bytes):
+    """
+    디코딩 없이 JPEG(SOF) / PNG(IHDR) 헤더에서 (width, height)만 읽음
+    알 수 없는 형식이면 None
+    """
+    data = image_bytes
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker == 0xFF:
+                i += 1
+                continue
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            if marker in JPEG_SOF_MARKERS:
+                height = int.from_bytes(data[i + 5:i + 7], "big")
+                width = int.from_bytes(data[i + 7:i + 9], "big")
+                return width, height
+            i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    elif data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    return None
+
+def choose_ingestion(width, height, endpoint="verify"):
+    """
+    이미지 크기와 예상 얼굴 크기로 축소 디코딩 배율과 검출기 입력 크기를 결정
+    - decode_scale: 얼굴이 min_face_px 이상 유지되는 가장 큰 배율 (1 / 2 / 4 / 8)
+    - det_size: 얼굴이 det_min_face_px 이상으로 보이는 가장 작은 검출기 입력 크기
+    (EXIF 회전과 무관하도록 짧은 변 / 긴 변 기준으로 계산)
+    """
+    from config import INGESTION_POLICIES
+
+    policy = INGESTION_POLICIES[endpoint]
+    short_side, long_side = min(width, height), max(width, height)
+    face_px = short_side * policy["expected_face_ratio"]
+
+    decode_scale = 1
+    for scale in (8, 4, 2):
+        if face_px / scale >= policy["min_face_px"]:
+            decode_scale = scale
+            break
+
+    decoded_long = long_side / decode_scale
+    decoded_face = face_px / decode_scale
+    det_sizes = sorted(policy["det_sizes"])
+    det_size = det_sizes[-1]
+    for size in det_sizes:
+        # 검출기는 긴 변을 size에 맞춰 축소하므로 얼굴도 같은 비율로 작아짐
+        if decoded_face * min(1.0, size / decoded_long) >= policy["det_min_face_px"]:
+            det_size = size
+            break
+
+    return {
+        "endpoint": endpoint,
+        "source_size": [int(width), int(height)],
+        "decode_scale": decode_scale,
+        "det_size": [det_size, det_size],
+    }
+
+def detect_main_face(img, det_size):
+    """
+    지정한 검출기 입력 크기로 얼굴을 검출하고, 가장 큰 얼굴에만 recognition 모델 적용
+    (app.get은 모든 얼굴에 landmark / genderage 모델까지 실행하지만 인증에는 embedding만 필요)
+    """
+    from insightface.app.common import Face
+
+    bboxes, kpss = app.det_model.detect(img, input_size=tuple(det_size), max_num=0, metric="default")
+    if bboxes.shape[0] == 0:
+        return None, 0
+
+    areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+    i = int(np.argmax(areas))
+    face = Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+    return face, bboxes.shape[0]
+
+def embed_face(img, face):
+    app.models["recognition"].get(img, face)
+    return face.embedding
+
+def extract_embedding_with_info(image_bytes, endpoint="verify"):
+    """
+    단일 이미지에서 얼굴 임베딩을 추출하고 적용된 입력 정책(축소 배율, 검출기 크기)을 함께 반환
     """
     if app is None:
         print("❌ InsightFace 모델이 로드되지 않았습니다.")
-        return None
+        return None, None
 
-    arr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+    size = read_image_size(image_bytes)
+    info = choose_ingestion(*size, endpoint=endpoint) if size else None
+    decode_scale = info["decode_scale"] if info else 1
+
+    img = decode_image(image_bytes, REDUCED_COLOR_FLAGS[decode_scale])
     if img is None:
         print("❌ 이미지를 디코딩하지 못했습니다.")
-        return None
+        return None, info
+
+    if info is None:
+        # 헤더로 크기를 알 수 없는 형식은 디코딩 결과 크기로 검출기 입력만 결정
+        info = choose_ingestion(img.shape[1], img.shape[0], endpoint=endpoint)
+        info["decode_scale"] = 1
 
     # CLAHE 전처리 적용
     img = apply_clahe(img)
@@ -65,33 +272,40 @@ def extract_embedding_from_image(image_bytes):
     # 추가: gamma correction 적용
     img = apply_gamma(img, gamma=1.2)
 
-    faces = app.get(img)
+    main_face, num_faces = detect_main_face(img, info["det_size"])
 
-    if not faces:
+    if main_face is None:
         print("❌ 얼굴을 감지하지 못했습니다.")
-        return None
-
-    if len(faces) > 1:
-        print(f"⚠️ 여러 얼굴 감지됨: {len(faces)}개. 가장 큰 얼굴만 사용.")
+        return None, info
 
-    # 가장 큰 얼굴 선택
-    main_face = max(faces, key=lambda x: (x.bbox[2] - x.bbox[0]) * (x.bbox[3] - x.bbox[1]))
+    if num_faces > 1:
+        print(f"⚠️ 여러 얼굴 감지됨: {num_faces}개. 가장 큰 얼굴만 사용.")
 
     # det_score 필터링
     if main_face.det_score < 0.3:
         print(f"❌ 얼굴 det_score 낮음: {main_face.det_score:.3f}")
-        return None
+        return None, info
 
-    return main_face.embedding
+    return embed_face(img, main_face), info
 
-def extract_embedding_from_video_kmeans(video_bytes, frame_skip=3, det_score_threshold=0.6, num_clusters=5):
-    tmp_path = "./temp_video.mp4"
-    with open(tmp_path, 'wb') as f:
+def extract_embedding_from_image(image_bytes, endpoint="verify"):
+    """
+    단일 이미지에서 얼굴 임베딩을 추출 (det_score 필터링, gamma correction 추가)
+    """
+    embedding, _ = extract_embedding_with_info(image_bytes, endpoint=endpoint)
+    return embedding
+
+def extract_embedding_from_video_kmeans(video_bytes, frame_skip=3, det_score_threshold=0.6, num_clusters=5, progress_callback=None, return_info=False):
+    # 동시에 여러 등록이 처리될 수 있으므로 요청마다 별도의 임시 파일 사용
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
         f.write(video_bytes)
+        tmp_path = f.name
 
     cap = cv2.VideoCapture(tmp_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
     embeddings = []
     frame_idx = 0
+    info = None
 
     while True:
         ret, frame = cap.read()
@@ -101,22 +315,31 @@ def extract_embedding_from_video_kmeans(video_bytes, frame_skip=3, det_score_thr
         if frame_idx % frame_skip != 0:
             continue
 
-        resized = cv2.resize(frame, (640, 480))
-        enhanced = apply_clahe(resized)
+        if progress_callback and total_frames > 0:
+            progress_callback(min(frame_idx / total_frames, 1.0))
+
+        # 첫 프레임 크기로 축소 배율 / 검출기 입력 크기 결정 (비율 유지, 640x480 강제 변환 대신)
+        if info is None:
+            info = choose_ingestion(frame.shape[1], frame.shape[0], endpoint="register")
+        if info["decode_scale"] > 1:
+            frame = cv2.resize(
+                frame,
+                (frame.shape[1] // info["decode_scale"], frame.shape[0] // info["decode_scale"]),
+                interpolation=cv2.INTER_AREA,
+            )
+        enhanced = apply_clahe(frame)
         rgb = cv2.cvtColor(enhanced, cv2.COLOR_BGR2RGB)
-        faces = app.get(rgb)
+        main_face, _ = detect_main_face(rgb, info["det_size"])
 
-        if faces:
-            main_face = max(faces, key=lambda x: (x.bbox[2]-x.bbox[0])*(x.bbox[3]-x.bbox[1]))
-            if main_face.det_score >= det_score_threshold:
-                embeddings.append(main_face.embedding)
+        if main_face is not None and main_face.det_score >= det_score_threshold:
+            embeddings.append(embed_face(rgb, main_face))
 
     cap.release()
     os.remove(tmp_path)
 
     if not embeddings:
         print("❌ 유효한 embedding 없음")
-        return None
+        return (None, info) if return_info else None
 
     embeddings = np.array(embeddings)
     print(f"✅ 총 {len(embeddings)}개 embedding 추출 완료")
@@ -137,9 +360,9 @@ def extract_embedding_from_video_kmeans(video_bytes, frame_skip=3, det_score_thr
 
         final_embeddings = np.array(cluster_embeddings)
         print(f"🎯 KMeans로 {len(final_embeddings)}개 대표 embedding 선별")
-        return final_embeddings
+        return (final_embeddings, info) if return_info else final_embeddings
 
     except Exception as e:
         print(f"⚠️ KMeans 실패, 전체 평균 embedding 사용: {e}")
         mean_emb = np.mean(embeddings, axis=0).reshape(1, -1)
-        return mean_emb
+        return (mean_emb, info) if return_info else mean_emb
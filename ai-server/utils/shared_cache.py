@@ -0,0 +1,374 @@
+import atexit
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 writer lock 불가 → 공유 캐시 비활성화
+    fcntl = None
+
+MAGIC = 0x33454B49  # "IKE3" (슬롯 형식이 바뀌면 값도 바꿈)
+HEADER_BYTES = 128
+ID_BYTES = 64
+SEQLOCK_RETRIES = 100
+
+# header (int64 x 16)
+H_MAGIC, H_SLOTS, H_TEMPLATES, H_DIM, H_COUNT, H_CLOCK, H_INDEX_SEQ, H_TOMBSTONES, H_EVICTIONS = range(9)
+
+# index 항목 값: 데이터 슬롯 번호 또는 아래 특수값
+EMPTY = -1
+TOMBSTONE = -2  # 삭제된 항목 (탐색은 계속 진행, 삽입 시 재사용)
+
+SLOT_DTYPE = np.dtype([
+    ("seq", np.uint64),          # seqlock 카운터 (홀수: 쓰기 중)
+    ("n_templates", np.int32),   # 저장된 template 개수
+    ("id_len", np.int32),        # 0이면 빈 슬롯
+    ("ref", np.uint8),           # clock 교체용 참조 비트 (조회 시 1)
+    ("user_id", f"S{ID_BYTES}"),
+])
+
+
+def _slot_hash(key: bytes) -> int:
+    """프로세스마다 값이 달라지는 hash() 대신 고정된 해시 사용"""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _untrack(shm):
+    """
+    resource_tracker가 프로세스 종료 시 공유 메모리를 unlink하지 않도록 등록 해제
+    (세그먼트 수명은 개별 worker가 아니라 참조 lock으로 관리: 마지막으로 닫는 프로세스가 unlink)
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _unlink(shm):
+    """_untrack한 세그먼트 unlink (unlink가 resource_tracker 등록 해제를 한 번 더 하므로 다시 등록 후 호출)"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.register(shm._name, "shared_memory")
+    except Exception:
+        pass
+    shm.unlink()
+
+
+class SharedEmbeddingStore:
+    """
+    여러 uvicorn worker가 함께 읽는 공유 메모리 embedding 저장소
+    - 고정 크기 데이터 슬롯(user_id당 최대 max_templates개 template) + open addressing index (슬롯 수의 2배 이상)
+    - 읽기는 lock 없이 seqlock으로 일관성 확인, 쓰기는 파일 lock으로 한 번에 하나의 writer만 허용
+    - 슬롯이 가득 차면 clock(second-chance) 방식으로 최근 조회되지 않은 사용자를 교체 (삭제 항목은 tombstone)
+    - 세그먼트를 쓰는 프로세스는 참조 파일에 공유 flock을 잡고, close()에서 마지막 프로세스가 unlink
+      (비정상 종료로 남은 세그먼트는 다음 서버 시작 시 아무도 참조하지 않으므로 새로 만듦)
+    - dict와 같은 방식(get / [] / in / len)으로 embedding_cache 자리에 그대로 사용
+    """
+
+    def __init__(self, name: str, n_slots: int, max_templates: int = 5, dim: int = 512):
+        if fcntl is None:
+            raise RuntimeError("이 플랫폼은 공유 embedding 캐시를 지원하지 않습니다.")
+
+        self.name = name
+        self.n_slots = n_slots
+        self.max_templates = max_templates
+        self.dim = dim
+        self.n_index = 1 << max(1, (2 * n_slots - 1).bit_length())
+
+        self._meta_offset = HEADER_BYTES + self.n_index * 4
+        meta_bytes = n_slots * SLOT_DTYPE.itemsize
+        self._data_offset = self._meta_offset + ((meta_bytes + 63) // 64) * 64
+        size = self._data_offset + n_slots * max_templates * dim * 4
+
+        self._thread_lock = threading.Lock()
+        self._lock_file = open(os.path.join("/tmp", f"{name}.lock"), "a+")
+        self._ref_file = open(os.path.join("/tmp", f"{name}.ref"), "a+")
+        self.shm = None
+
+        with self._writer_lock():
+            if self._sole_user():
+                # 살아 있는 사용자가 없으면 이전 실행이 남긴 세그먼트(설정이 다를 수도 있음)를 지우고 새로 생성
+                self._unlink_stale()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                created = True
+            else:
+                self.shm = shared_memory.SharedMemory(name=name)
+                created = False
+            _untrack(self.shm)
+            fcntl.flock(self._ref_file.fileno(), fcntl.LOCK_SH)
+            self._map_arrays()
+
+            if created:
+                self.header[:] = 0
+                self.header[H_SLOTS:H_DIM + 1] = (n_slots, max_templates, dim)
+                self.index[:] = EMPTY
+                self.meta[:] = np.zeros(n_slots, dtype=SLOT_DTYPE)
+                self.header[H_MAGIC] = MAGIC
+                print(f"✅ 공유 embedding 캐시 생성: {name} ({size / 1024 / 1024:.1f} MB, {n_slots}슬롯)")
+            elif self.header[H_MAGIC] != MAGIC or tuple(self.header[H_SLOTS:H_DIM + 1]) != (n_slots, max_templates, dim):
+                self._release()
+                raise RuntimeError(
+                    f"실행 중인 다른 worker의 공유 메모리 {name} 형식이 현재 설정과 다릅니다. "
+                    "모든 worker의 EMBEDDING_SHM_* 설정을 같게 맞춰주세요."
+                )
+            else:
+                print(f"✅ 공유 embedding 캐시 연결: {name} ({len(self)}명 저장됨)")
+
+    def _map_arrays(self):
+        buf = self.shm.buf
+        self.header = np.ndarray((HEADER_BYTES // 8,), dtype=np.int64, buffer=buf, offset=0)
+        self.index = np.ndarray((self.n_index,), dtype=np.int32, buffer=buf, offset=HEADER_BYTES)
+        self.meta = np.ndarray((self.n_slots,), dtype=SLOT_DTYPE, buffer=buf, offset=self._meta_offset)
+        self.data = np.ndarray(
+            (self.n_slots, self.max_templates, self.dim), dtype=np.float32, buffer=buf, offset=self._data_offset
+        )
+
+    @contextmanager
+    def _writer_lock(self):
+        """같은 프로세스의 스레드 + 다른 worker 프로세스 모두에 대해 단일 writer 보장"""
+        with self._thread_lock:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _sole_user(self) -> bool:
+        """참조 파일에 다른 프로세스의 공유 lock이 없으면 True (flock은 프로세스가 죽으면 자동 해제)"""
+        try:
+            fcntl.flock(self._ref_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlink_stale(self):
+        try:
+            stale = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return
+        _untrack(stale)
+        stale.close()
+        _unlink(stale)
+        print(f"🧹 이전 실행에서 남은 공유 embedding 캐시 삭제: {self.name}")
+
+    def _find(self, key: bytes):
+        """
+        index에서 key 탐색 → (index 위치, 데이터 슬롯)
+        없으면 (삽입할 index 위치 - 처음 만난 tombstone 우선, None)
+        """
+        mask = self.n_index - 1
+        pos = _slot_hash(key) & mask
+        insert_at = None
+        for _ in range(self.n_index):
+            slot = int(self.index[pos])
+            if slot == EMPTY:
+                return (pos if insert_at is None else insert_at), None
+            if slot == TOMBSTONE:
+                if insert_at is None:
+                    insert_at = pos
+            elif 0 <= slot < self.n_slots and self.meta["user_id"][slot] == key:
+                return pos, slot
+            pos = (pos + 1) & mask
+        return insert_at, None
+
+    @staticmethod
+    def _key(user_id: str) -> bytes:
+        key = user_id.encode()
+        if len(key) > ID_BYTES:
+            raise ValueError(f"user_id가 너무 깁니다 (최대 {ID_BYTES} bytes): {user_id}")
+        return key
+
+    def get(self, user_id: str, default=None):
+        """
+        user_id의 template 조회 - (n, dim) 또는 template이 1개면 (dim,) 반환
+        (복호화 결과와 같은 shape이 되도록 decrypt_embedding 규칙을 따름)
+        - index가 바뀌는 중(삽입/교체)이면 index seqlock 확인에 실패하므로 다시 탐색
+        """
+        key = user_id.encode()
+        if len(key) > ID_BYTES:
+            return default  # 저장할 수 없는 길이의 user_id는 캐시에 없는 것과 같음
+        for _ in range(SEQLOCK_RETRIES):
+            index_seq = int(self.header[H_INDEX_SEQ])
+            if index_seq % 2:
+                continue
+            _, slot = self._find(key)
+            if slot is None:
+                if int(self.header[H_INDEX_SEQ]) == index_seq:
+                    return default
+                continue
+
+            seq = int(self.meta["seq"][slot])
+            if seq % 2:
+                continue
+            n = int(self.meta["n_templates"][slot])
+            templates = self.data[slot, :n].copy()
+            if int(self.meta["seq"][slot]) == seq and int(self.header[H_INDEX_SEQ]) == index_seq:
+                if not self.meta["ref"][slot]:
+                    self.meta["ref"][slot] = 1
+                return templates[0] if n == 1 else templates
+        return default
+
+    def __getitem__(self, user_id: str):
+        templates = self.get(user_id)
+        if templates is None:
+            raise KeyError(user_id)
+        return templates
+
+    def __setitem__(self, user_id: str, embedding):
+        templates = np.asarray(embedding, dtype=np.float32)
+        if templates.ndim == 1:
+            templates = templates.reshape(1, -1)
+        if templates.shape[1] != self.dim or templates.shape[0] > self.max_templates:
+            raise ValueError(f"공유 캐시에 저장할 수 없는 embedding shape입니다: {templates.shape}")
+
+        key = self._key(user_id)
+        with self._writer_lock():
+            _, slot = self._find(key)
+            if slot is not None:
+                # 기존 사용자: index는 그대로 두고 슬롯 내용만 seqlock으로 교체
+                self._write_slot(slot, templates)
+                return
+
+            slot = self._allocate_slot()
+            self._write_slot(slot, templates, key)
+            pos, _ = self._find(key)
+            self._begin_index_write()
+            if int(self.index[pos]) == TOMBSTONE:
+                self.header[H_TOMBSTONES] -= 1
+            self.index[pos] = slot
+            self.header[H_COUNT] += 1
+            self._end_index_write()
+
+            if self.header[H_TOMBSTONES] > self.n_index // 4:
+                self._rebuild_index()
+
+    def _write_slot(self, slot, templates, key: bytes = None):
+        entry = self.meta[slot:slot + 1]
+        entry["seq"] += 1
+        self.data[slot, :len(templates)] = templates
+        entry["n_templates"] = len(templates)
+        entry["ref"] = 1
+        if key is not None:
+            entry["user_id"] = key
+            entry["id_len"] = len(key)
+        entry["seq"] += 1
+
+    def _allocate_slot(self) -> int:
+        """빈 데이터 슬롯을 우선 사용하고, 없으면 clock 방식으로 참조 비트가 0인 사용자를 교체"""
+        if len(self) < self.n_slots:
+            free = np.flatnonzero(self.meta["id_len"] == 0)
+            if len(free):
+                return int(free[0])
+
+        for _ in range(2 * self.n_slots):
+            hand = int(self.header[H_CLOCK])
+            self.header[H_CLOCK] = (hand + 1) % self.n_slots
+            if self.meta["id_len"][hand] == 0:
+                return hand
+            if self.meta["ref"][hand]:
+                self.meta["ref"][hand] = 0
+                continue
+            self._evict(hand)
+            return hand
+        raise RuntimeError("공유 embedding 캐시에서 교체할 슬롯을 찾지 못했습니다.")
+
+    def _evict(self, slot):
+        key = bytes(self.meta["user_id"][slot])
+        pos, found = self._find(key)
+        self._begin_index_write()
+        if found is not None:
+            self.index[pos] = TOMBSTONE
+            self.header[H_TOMBSTONES] += 1
+            self.header[H_COUNT] -= 1
+        self.meta["id_len"][slot] = 0
+        self._end_index_write()
+        self.header[H_EVICTIONS] += 1
+
+    def _rebuild_index(self):
+        """tombstone이 쌓여 탐색 길이가 늘어나면 살아 있는 슬롯만으로 index를 다시 구성"""
+        self._begin_index_write()
+        self.index[:] = EMPTY
+        mask = self.n_index - 1
+        for slot in np.flatnonzero(self.meta["id_len"] > 0):
+            pos = _slot_hash(bytes(self.meta["user_id"][slot])) & mask
+            while int(self.index[pos]) != EMPTY:
+                pos = (pos + 1) & mask
+            self.index[pos] = slot
+        self.header[H_TOMBSTONES] = 0
+        self._end_index_write()
+
+    def _begin_index_write(self):
+        self.header[H_INDEX_SEQ] += 1
+
+    def _end_index_write(self):
+        self.header[H_INDEX_SEQ] += 1
+
+    def __contains__(self, user_id: str):
+        return self.get(user_id) is not None
+
+    def __len__(self):
+        return int(self.header[H_COUNT])
+
+    @property
+    def evictions(self):
+        """모든 worker에서 슬롯 부족으로 교체된 사용자 누적 수"""
+        return int(self.header[H_EVICTIONS])
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    def _release(self):
+        """세그먼트 연결 해제 - 참조 중인 다른 프로세스가 없으면 unlink (writer lock 안에서 호출)"""
+        self.header = self.index = self.meta = self.data = None
+        self.shm.close()
+        if self._sole_user():
+            _unlink(self.shm)
+            print(f"🧹 공유 embedding 캐시 삭제: {self.name}")
+        fcntl.flock(self._ref_file.fileno(), fcntl.LOCK_UN)
+
+    def close(self):
+        if self.shm is None:
+            return
+        with self._writer_lock():
+            self._release()
+            self.shm = None
+        self._ref_file.close()
+        self._lock_file.close()
+
+
+def create_embedding_cache():
+    """
+    설정에 따라 공유 메모리 캐시 또는 프로세스 로컬 dict 반환
+    - 지원하지 않는 플랫폼이거나 공유 메모리를 만들 수 없으면 기존처럼 dict 사용
+    - 실행 중인 다른 worker와 설정이 다르면 조용히 넘어가지 않고 예외 발생
+    """
+    from config import SHARED_EMBEDDING_CACHE, EMBEDDING_SHM_NAME, EMBEDDING_SHM_SLOTS, EMBEDDING_SHM_TEMPLATES
+
+    if not SHARED_EMBEDDING_CACHE:
+        return {}
+    if fcntl is None:
+        print("⚠️ 이 플랫폼은 공유 embedding 캐시를 지원하지 않아 프로세스 로컬 캐시 사용")
+        return {}
+
+    try:
+        store = SharedEmbeddingStore(EMBEDDING_SHM_NAME, EMBEDDING_SHM_SLOTS, EMBEDDING_SHM_TEMPLATES)
+    except OSError as e:
+        print(f"⚠️ 공유 embedding 캐시 생성 실패, 프로세스 로컬 캐시 사용: {e}")
+        return {}
+    # shutdown 훅이 실행되지 않는 종료 경로에서도 연결 해제 (close는 여러 번 호출해도 안전)
+    atexit.register(store.close)
+    return store
+
+
+def cache_nbytes(cache):
+    """embedding 캐시가 차지하는 메모리 (공유 메모리면 세그먼트 전체 크기)"""
+    if isinstance(cache, SharedEmbeddingStore):
+        return cache.nbytes
+    return int(sum(emb.nbytes for emb in list(cache.values())))
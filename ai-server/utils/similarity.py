@@ -1,3 +1,4 @@
+import threading
 import numpy as np
 
 def cosine_similarity(a, b):
@@ -18,3 +19,136 @@ def compare_embeddings(a, b, threshold_cosine=0.5):
         "cosine_similarity": cos_sim,
         "verified": verified
     }
+
+def normalize_rows(embeddings):
+    """(n, d) 또는 (d,) embedding을 L2 정규화된 (n, d) float32 행렬로 변환"""
+    mat = np.asarray(embeddings, dtype=np.float32)
+    if mat.ndim == 1:
+        mat = mat.reshape(1, -1)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / np.maximum(norms, 1e-12)
+
+def _stack(user_ids, mats):
+    """사용자별 template 행렬 목록을 (user_ids, 연속 행렬, 사용자별 시작 행) 스냅샷으로 묶음"""
+    if not mats:
+        return user_ids, np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    matrix = np.ascontiguousarray(np.vstack(mats))
+    counts = np.array([len(m) for m in mats])
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+    return user_ids, matrix, offsets
+
+def _user_scores(probes, matrix, offsets):
+    """(f, d) probe에 대한 사용자별 최대 코사인 유사도 (f, n_users)"""
+    if len(offsets) == 0:
+        return np.zeros((len(probes), 0), dtype=np.float32)
+    return np.maximum.reduceat(probes @ matrix.T, offsets, axis=1)
+
+class GalleryIndex:
+    """
+    등록된 전체 사용자 embedding을 하나의 정규화 행렬로 묶은 1:N 검색용 인덱스
+    - 사용자별 template(최대 5개)은 연속된 행으로 저장되고, 사용자 점수는 template 중 최대 코사인 유사도
+    - Python 루프 대신 행렬곱 한 번 + np.maximum.reduceat으로 전체 사용자 점수를 계산
+    - 전체 사용자는 base 행렬에만 보관하고(사용자별 사본 없음), add된 사용자는 작은 delta에 모아 두었다가
+      DELTA_MERGE_MIN명(또는 base의 DELTA_MERGE_RATIO)을 넘으면 base에 병합
+    - remove되거나 다시 add된 base 사용자는 병합 전까지 점수 계산에서 제외(mask)
+    - 검색은 항상 완성된 스냅샷으로 수행 (스레드 안전)
+    """
+
+    DELTA_MERGE_MIN = 256
+    DELTA_MERGE_RATIO = 0.05
+
+    def __init__(self, embeddings=None):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._delta = {}       # user_id → 정규화된 template (병합 전 추가 / 재등록 사용자)
+        self._masked = set()   # base에서 제외할 user_id (삭제 또는 delta로 교체됨)
+        embeddings = embeddings or {}
+        self._set_base(*_stack(list(embeddings), [normalize_rows(e) for e in embeddings.values()]))
+
+    def _set_base(self, user_ids, matrix, offsets):
+        self._base = (user_ids, matrix, offsets)
+        self._base_pos = {user_id: i for i, user_id in enumerate(user_ids)}
+
+    def add(self, user_id, embedding):
+        with self._lock:
+            self._delta[user_id] = normalize_rows(embedding)
+            if user_id in self._base_pos:
+                self._masked.add(user_id)
+            if len(self._delta) + len(self._masked) > max(self.DELTA_MERGE_MIN, self.DELTA_MERGE_RATIO * len(self._base_pos)):
+                self._merge()
+            self._snapshot = None
+
+    def remove(self, user_id):
+        with self._lock:
+            removed = self._delta.pop(user_id, None) is not None
+            if user_id in self._base_pos and user_id not in self._masked:
+                self._masked.add(user_id)
+                removed = True
+            if removed:
+                self._snapshot = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._base_pos) - len(self._masked) + len(self._delta)
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return user_id in self._delta or (user_id in self._base_pos and user_id not in self._masked)
+
+    def _merge(self):
+        """mask된 base 행을 빼고 delta를 이어 붙여 새 base 생성 (lock 안에서 호출)"""
+        user_ids, matrix, offsets = self._base
+        keep = np.array([u not in self._masked for u in user_ids], dtype=bool)
+        base_counts = np.diff(np.append(offsets, len(matrix)))
+        merged_ids = [u for u, k in zip(user_ids, keep) if k] + list(self._delta)
+        mats = [matrix[np.repeat(keep, base_counts)]] if keep.any() else []
+        mats.extend(self._delta.values())
+        counts = np.concatenate([base_counts[keep], [len(m) for m in self._delta.values()]]).astype(np.int64)
+
+        if mats:
+            merged_matrix = np.ascontiguousarray(np.vstack(mats))
+            merged_offsets = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        else:
+            merged_matrix, merged_offsets = np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int64)
+        self._set_base(merged_ids, merged_matrix, merged_offsets)
+        self._delta, self._masked = {}, set()
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None:
+                base_ids, base_matrix, base_offsets = self._base
+                keep = None
+                if self._masked:
+                    keep = np.array([u not in self._masked for u in base_ids], dtype=bool)
+                    base_ids = [u for u, k in zip(base_ids, keep) if k]
+                delta = _stack(list(self._delta), list(self._delta.values()))
+                self._snapshot = (base_ids + delta[0], (base_matrix, base_offsets, keep), delta[1:])
+            return self._snapshot
+
+    def scores(self, embeddings):
+        """
+        probe embedding(들)에 대한 전체 사용자 점수
+        - 입력 (d,) → (n_users,), 입력 (f, d) → (f, n_users)
+        """
+        user_ids, (base_matrix, base_offsets, keep), (delta_matrix, delta_offsets) = self._get_snapshot()
+        single = np.asarray(embeddings).ndim == 1
+        probes = normalize_rows(embeddings)
+        result = _user_scores(probes, base_matrix, base_offsets)
+        if keep is not None:
+            result = result[:, keep]
+        if len(delta_offsets):
+            result = np.hstack([result, _user_scores(probes, delta_matrix, delta_offsets)])
+        return (result[0] if single else result), user_ids
+    def search(self, embedding, k=1):
+        """단일 probe에 대해 점수 상위 k명의 [(user_id, score), ...] 반환"""
+        scores, user_ids = self.scores(embedding)
+        if len(user_ids) == 0:
+            return []
+        k = min(k, len(user_ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(user_ids[i], float(scores[i])) for i in top]
@@ -0,0 +1,226 @@
+"""
+compileSeatMap.py
+─────────────────
+공연장 전체 좌석 배치(JSON)를 읽어 모든 구역의 좌석 SQL을 생성합니다.
+
+  1) 구역별 기존 좌석 DELETE
+  2) 새 좌석을 PostgreSQL COPY 형식(기본) 또는 batch INSERT로 출력
+
+genSeatSql.py는 한 구역만 하드코딩하고 거대한 INSERT 문자열 하나를 메모리에 만들지만,
+이 스크립트는 구역 단위로 한 줄씩 바로 출력하므로 좌석 수와 상관없이 메모리 사용이 일정합니다.
+
+공연장 파일 형식 (venueSeatMap.example.json 참고):
+    {
+      "venue": "KSPO DOME",
+      "sections": [
+        {
+          "name": "41",
+          "section_id": "<sections.id>",
+          "grades": {"1": "<seat_grades.id>", "2": "<seat_grades.id>"},
+          "pattern": ["0010011", ...],          # 또는 "pattern_file": "sections/41.txt"
+          "expected_seats": 213                 # (선택) 좌석 수 검증
+        }
+      ]
+    }
+  - pattern의 '0' / '.' / ' ' 은 빈 칸, 그 외 문자는 grades에 정의된 좌석 등급입니다.
+  - pattern_file의 빈 줄도 pattern의 ""와 같이 한 행(통로)으로 취급하고, 파일 끝의 빈 줄만 무시합니다.
+
+사용:
+    python compileSeatMap.py venue.json > venue_seats.sql
+    python compileSeatMap.py venue.json --format insert --batch-size 1000 > venue_seats.sql
+    python compileSeatMap.py venue.json --check          # 검증만 수행
+    psql -d DBNAME -f venue_seats.sql
+"""
+import argparse
+import json
+import os
+import sys
+from uuid import UUID, uuid4
+
+EMPTY_CELLS = {'0', '.', ' '}
+COLUMNS = "(id, section_id, row_idx, col_idx, seat_grade_id)"
+
+
+class SeatMapError(Exception):
+    pass
+
+
+# ────────────────────────────────
+# 1. 공연장 파일 로드 및 검증
+# ────────────────────────────────
+def load_pattern(section, base_dir):
+    if "pattern" in section:
+        return section["pattern"]
+    if "pattern_file" in section:
+        path = os.path.join(base_dir, section["pattern_file"])
+        try:
+            with open(path, encoding="utf-8") as f:
+                lines = [line.rstrip("\r\n") for line in f]
+        except OSError as e:
+            raise SeatMapError(f"[{section.get('name')}] pattern_file을 읽을 수 없습니다: {path} ({e.strerror})")
+        # 중간의 빈 줄(통로 행)은 행 번호 유지를 위해 그대로 두고, 파일 끝의 빈 줄만 제거
+        while lines and not lines[-1].strip():
+            lines.pop()
+        return lines
+    raise SeatMapError(f"[{section.get('name')}] pattern 또는 pattern_file이 필요합니다.")
+
+
+def load_venue(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except OSError as e:
+        raise SeatMapError(f"공연장 파일을 읽을 수 없습니다: {path} ({e.strerror})")
+    except json.JSONDecodeError as e:
+        raise SeatMapError(f"공연장 파일이 올바른 JSON이 아닙니다: {path} ({e.lineno}행 {e.colno}열: {e.msg})")
+
+
+def check_uuid(value, label):
+    try:
+        UUID(str(value))
+    except ValueError:
+        raise SeatMapError(f"{label}이(가) UUID 형식이 아닙니다: {value}")
+
+
+def validate_venue(venue, base_dir):
+    """
+    모든 구역을 출력 전에 검증하고 구역별 좌석 수를 반환
+    - section_id / name 중복(같은 구역이 두 번 정의되어 좌석이 겹치는 경우)
+    - grades에 없는 패턴 문자, UUID 형식, expected_seats 불일치
+    """
+    sections = venue.get("sections") or []
+    if not sections:
+        raise SeatMapError("sections가 비어 있습니다.")
+
+    seen_ids, seen_names = {}, {}
+    counts = []
+    for section in sections:
+        name = str(section.get("name", section.get("section_id")))
+        section_id = section.get("section_id")
+        check_uuid(section_id, f"[{name}] section_id")
+
+        if section_id in seen_ids:
+            raise SeatMapError(f"[{name}] section_id가 [{seen_ids[section_id]}] 구역과 겹칩니다: {section_id}")
+        if name in seen_names:
+            raise SeatMapError(f"구역 이름이 중복되었습니다: {name}")
+        seen_ids[section_id] = name
+        seen_names[name] = section_id
+
+        grades = section.get("grades") or {}
+        if not grades:
+            raise SeatMapError(f"[{name}] grades가 비어 있습니다.")
+        for key, grade_id in grades.items():
+            if len(key) != 1 or key in EMPTY_CELLS:
+                raise SeatMapError(f"[{name}] grades 키는 빈 칸 문자가 아닌 한 글자여야 합니다: '{key}'")
+            check_uuid(grade_id, f"[{name}] grade '{key}'")
+
+        count = 0
+        for r, row in enumerate(load_pattern(section, base_dir)):
+            for c, ch in enumerate(row):
+                if ch in EMPTY_CELLS:
+                    continue
+                if ch not in grades:
+                    raise SeatMapError(f"[{name}] {r}행 {c}열: grades에 없는 문자 '{ch}'")
+                count += 1
+
+        expected = section.get("expected_seats")
+        if expected is not None and expected != count:
+            raise SeatMapError(f"[{name}] 좌석 수 불일치: expected_seats={expected}, 패턴={count}")
+
+        counts.append((name, count))
+    return counts
+
+
+# ────────────────────────────────
+# 2. 구역 단위 스트리밍 출력
+# ────────────────────────────────
+def iter_seats(section, base_dir):
+    grades = section["grades"]
+    for r, row in enumerate(load_pattern(section, base_dir)):
+        for c, ch in enumerate(row):
+            if ch not in EMPTY_CELLS:
+                yield r, c, grades[ch]
+
+
+def write_copy(out, section, base_dir):
+    section_id = section["section_id"]
+    out.write(f"COPY public.seats {COLUMNS} FROM stdin;\n")
+    for r, c, grade_id in iter_seats(section, base_dir):
+        out.write(f"{uuid4()}\t{section_id}\t{r}\t{c}\t{grade_id}\n")
+    out.write("\\.\n")
+
+
+def write_inserts(out, section, base_dir, batch_size):
+    section_id = section["section_id"]
+    batch = []
+
+    def flush():
+        out.write(f"INSERT INTO public.seats {COLUMNS}\nVALUES\n  ")
+        out.write(",\n  ".join(batch))
+        out.write(";\n")
+        batch.clear()
+
+    for r, c, grade_id in iter_seats(section, base_dir):
+        batch.append(f"(gen_random_uuid(),'{section_id}',{r},{c},'{grade_id}')")
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+
+def compile_venue(venue, base_dir, out, fmt="copy", batch_size=1000, delete=True):
+    counts = validate_venue(venue, base_dir)
+    total = sum(count for _, count in counts)
+
+    out.write(f"-- {venue.get('venue', '')} 좌석 데이터 Rebuild (총 {len(counts)}구역 / {total}석)\n")
+    out.write("BEGIN;\n\n")
+    for section, (name, count) in zip(venue["sections"], counts):
+        out.write(f"-- {name}구역 ({count}석)\n")
+        if delete:
+            out.write(f"DELETE FROM public.seats WHERE section_id = '{section['section_id']}';\n")
+        if fmt == "copy":
+            write_copy(out, section, base_dir)
+        else:
+            write_inserts(out, section, base_dir, batch_size)
+        out.write("\n")
+    out.write("COMMIT;\n")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="공연장 좌석 배치 → seats SQL 변환")
+    parser.add_argument("venue_file", help="공연장 좌석 배치 JSON 파일")
+    parser.add_argument("--format", choices=["copy", "insert"], default="copy", help="출력 형식 (기본: copy)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="insert 형식일 때 INSERT 한 문장당 좌석 수")
+    parser.add_argument("--no-delete", action="store_true", help="기존 좌석 DELETE 문 생략")
+    parser.add_argument("--check", action="store_true", help="SQL 출력 없이 검증 결과만 표시")
+    parser.add_argument("-o", "--output", help="출력 파일 (기본: stdout)")
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.abspath(args.venue_file))
+
+    try:
+        venue = load_venue(args.venue_file)
+        if args.check:
+            counts = validate_venue(venue, base_dir)
+        else:
+            out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+            try:
+                counts = compile_venue(
+                    venue, base_dir, out,
+                    fmt=args.format, batch_size=args.batch_size, delete=not args.no_delete,
+                )
+            finally:
+                if args.output:
+                    out.close()
+    except SeatMapError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for name, count in counts:
+        print(f"  - {name}구역: {count}석", file=sys.stderr)
+    print(f"✅ 총 {len(counts)}구역 / {sum(c for _, c in counts)}석", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()